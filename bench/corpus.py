@@ -0,0 +1,89 @@
+import base64
+import random
+
+# Kinds of company sites in the synthetic corpus, with whether an email can be found for them
+KINDS = {
+    "profile_email": True,  # Email on the Europages profile itself
+    "homepage_mailto": True,
+    "obfuscated": True,  # info (at) company.com
+    "contact_page": True,  # Email on a contact subpage
+    "iframe": True,
+    "base64": True,  # Email hidden in a base64 encoded attribute
+    "redirect": True,  # Homepage redirects before showing the email
+    "large_page": True,  # Multi-megabyte homepage with the email at the top
+    "slow": True,  # Server takes a while to answer
+    "not_found": False,  # 404
+    "unavailable": False,  # 503
+    "no_email": False,
+    "dead_host": False,  # Domain that doesn't resolve
+}
+COUNTRIES = ["France", "Italy", "Spain", "Portugal", "Germany", "Hungary", "Greece"]
+
+def build_corpus(companies=200, seed=0):
+    """Builds a deterministic list of synthetic companies, each with its site kind and expected email."""
+    rng = random.Random(seed)
+    kinds = list(KINDS)
+    corpus = []
+    for n in range(companies):
+        kind = rng.choice(kinds)
+        corpus.append({
+            "id": n,
+            "kind": kind,
+            "name": f"Bench Winery {n}",
+            "country": rng.choice(COUNTRIES),
+            "email": f"info@winery{n}.com" if KINDS[kind] else None,
+        })
+    return corpus
+
+def listing_page(corpus, page, per_page, config):
+    companies = corpus[page * per_page:(page + 1) * per_page]
+    tiles = "".join(f'<a class="{config["company_tile_class"]}" href="/en/company/{c["id"]}"><img alt=""></a>' for c in companies)
+    next_button = ""
+    if (page + 1) * per_page < len(corpus):
+        next_button = f'<a class="{config["next_button_class"]}" href="/en/search?q=bench&page={page + 1}">Next</a>'
+    return f"<html><body><main>{tiles}</main><nav>{next_button}</nav></body></html>"
+
+def profile_page(company, site_url, config):
+    email = f'<p>Email: {company["email"]}</p>' if company["kind"] == "profile_email" else ""
+    return (
+        f'<html><body><a class="{config["company_name_class"]}" href="#">{company["name"]}</a>'
+        f'<div class="flex gap-1 items-center mt-0.5"><span>flag</span><span>{company["country"]}</span></div>'
+        f'<a class="{config["company_link_class"]}" href="{site_url}">Website</a>{email}'
+        f'<footer>{"<p>Lorem ipsum dolor sit amet.</p>" * 50}</footer></body></html>'
+    )
+
+def site_page(company, path):
+    """Returns (status, headers, body) for a path of a company site."""
+    kind, email = company["kind"], company["email"]
+    nav = f'<nav><a href="/site/{company["id"]}/">Home</a><a href="/site/{company["id"]}/about">About</a></nav>'
+    filler = "<p>Our vineyards have been family owned since 1890.</p>" * 40
+
+    if kind == "not_found":
+        return 404, {}, "<html><body>Not found</body></html>"
+    if kind == "unavailable":
+        return 503, {}, "<html><body>Service unavailable</body></html>"
+    if kind == "redirect" and path == "":
+        return 301, {"Location": f"/site/{company['id']}/home"}, ""
+
+    if path == "contact" and kind == "contact_page":
+        return 200, {}, f"<html><body>{nav}<h1>Contact</h1><p>Write to {email}</p></body></html>"
+    if path == "frame" and kind == "iframe":
+        return 200, {}, f"<html><body><p>{email}</p></body></html>"
+    if path not in ("", "home"):
+        return 404, {}, "<html><body>Not found</body></html>"
+
+    if kind in ("homepage_mailto", "redirect", "slow"):
+        body = f'<a href="mailto:{email}">Mail us</a>{filler}'
+    elif kind == "obfuscated":
+        body = f'{filler}<p>{email.replace("@", " (at) ")}</p>'
+    elif kind == "contact_page":
+        body = f'{filler}<a href="/site/{company["id"]}/contact">Contact</a>'
+    elif kind == "iframe":
+        body = f'{filler}<iframe src="/site/{company["id"]}/frame"></iframe>'
+    elif kind == "base64":
+        body = f'{filler}<span data-mail="{base64.b64encode(("mailto:" + email).encode()).decode()}">Mail</span>'
+    elif kind == "large_page":
+        body = f'<a href="mailto:{email}">Mail us</a>' + "<p>" + "x" * 4 * 1024**2 + "</p>"
+    else:
+        body = filler
+    return 200, {}, f"<html><head><meta charset=\"utf-8\"></head><body>{nav}{body}</body></html>"
@@ -0,0 +1,106 @@
+"""Runs a distributed crawl (seed, work, export) of the synthetic corpus against the local stand-in for Europages,
+with the SQLite queue and with the Redis queue on an in-memory stand-in for the server.
+
+Run from the repository root:
+    python -m bench.distributed --companies 100 --workers 3
+
+Workers are threads here, each with its own queue connection. The first one crashes after leasing a job, which
+is handed out again once its visibility timeout passed. Transient failures (the corpus' 503 sites) are retried
+until MAX_ATTEMPTS and end up dead, companies without an email are done without a result.
+"""
+import os
+import csv
+import time
+import argparse
+import tempfile
+import threading
+from src import distributed
+from src.drivers import DriverPool
+from src.workqueue import SqliteQueue, RedisQueue
+from .corpus import build_corpus
+from .memredis import MemoryRedis
+from .run import CONFIG, NullDriver
+from .server import BenchServer
+
+VISIBILITY_TIMEOUT = 10  # Seconds before the job of the crashed worker is handed out again (longer than any job)
+
+def run(backend, companies=100, per_page=20, workers=3, threads=4, hosts=16, slow_delay=2.0, seed=0):
+    """Crawls the synthetic corpus with workers sharing a queue and returns the report."""
+    corpus = build_corpus(companies, seed)
+    expected = {company["name"]: company["email"] for company in corpus}
+    server = MemoryRedis()
+    def open_queue():
+        if backend == "redis":
+            return RedisQueue(server, visibility_timeout=VISIBILITY_TIMEOUT)
+        return SqliteQueue("output/queue.db", visibility_timeout=VISIBILITY_TIMEOUT)
+
+    driver_pool = distributed.DriverPool
+    distributed.DriverPool = lambda size, max_pages: DriverPool(size, max_pages, factory=NullDriver)
+    cwd = os.getcwd()
+    with BenchServer(corpus, CONFIG, per_page, hosts, slow_delay) as bench_server, tempfile.TemporaryDirectory() as workdir:
+        config = dict(
+            CONFIG, start_url=bench_server.base_url, search_url=bench_server.base_url + "/en/search?q=", sectors=["bench"],
+            host_limits={"127.0.0.1": {"concurrency": threads}}, drivers=1, driver_max_pages=200, dns_cache=None,
+            cache_dir=None, offline=False, planner=None, output_dir="output",
+        )
+        websites = {"bench": config}
+        os.chdir(workdir)  # Keep the queue, error logs and CSVs out of the repository
+        try:
+            queue = open_queue()
+            distributed.seed(queue, websites)
+            start = time.perf_counter()
+            queue.get()  # The crashed worker: leases a job and never acknowledges it
+
+            def work():
+                with open_queue() as worker_queue:
+                    distributed.work(worker_queue, websites, threads)
+            runs = [threading.Thread(target=work) for _ in range(workers)]
+            for thread in runs:
+                thread.start()
+            for thread in runs:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            distributed.export(queue, websites)
+            with open("output/emails_bench.csv", newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            counts = queue.counts()
+            queue.close()
+        finally:
+            os.chdir(cwd)
+            distributed.DriverPool = driver_pool
+        served = bench_server.stats()
+
+    hits = sum(1 for row in rows if row["email"] == expected.get(row["name"]))
+    with_email = sum(1 for email in expected.values() if email)
+    return {
+        "backend": backend,
+        "companies": companies,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "requests": served["requests"],
+        "jobs": counts,
+        "email_hit_rate": round(hits / with_email, 4) if with_email else None,
+        "wrong_emails": len(rows) - hits,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "redis", "both"], default="both")
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--per-page", type=int, default=20, help="Companies per listing page")
+    parser.add_argument("--workers", type=int, default=3, help="Workers sharing the queue")
+    parser.add_argument("--threads", type=int, default=4, help="Jobs a worker runs concurrently")
+    parser.add_argument("--hosts", type=int, default=16, help="Loopback hosts the company sites are spread over")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds the slow sites take to answer")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = ["sqlite", "redis"] if args.backend == "both" else [args.backend]
+    for backend in backends:
+        report = run(backend, args.companies, args.per_page, args.workers, args.threads, args.hosts, args.slow_delay, args.seed)
+        for name, value in report.items():
+            print(f"{name:>20}: {value}")
+
+if __name__ == "__main__":
+    main()
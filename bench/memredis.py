@@ -0,0 +1,115 @@
+import threading
+from src.workqueue import LEASE_SCRIPT
+
+class MemoryRedis:
+    """In-memory stand-in for a Redis server, with the commands RedisQueue uses. Keys, members and values are
+    stored and returned as bytes like redis-py does. eval only runs LEASE_SCRIPT.
+
+    Every RedisQueue on the same MemoryRedis sees the same data, like clients of one server, so workers on
+    threads can run a distributed crawl without a server.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def sadd(self, key, member):
+        with self.lock:
+            members = self.data.setdefault(encode(key), set())
+            added = encode(member) not in members
+            members.add(encode(member))
+            return int(added)
+
+    def smembers(self, key):
+        with self.lock:
+            return set(self.data.get(encode(key), set()))
+
+    def srem(self, key, member):
+        with self.lock:
+            members = self.data.get(encode(key), set())
+            removed = encode(member) in members
+            members.discard(encode(member))
+            return int(removed)
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self.data.setdefault(encode(key), {})[encode(field)] = encode(value)
+
+    def hget(self, key, field):
+        with self.lock:
+            return self.data.get(encode(key), {}).get(encode(field))
+
+    def hdel(self, key, field):
+        with self.lock:
+            return int(self.data.get(encode(key), {}).pop(encode(field), None) is not None)
+
+    def hlen(self, key):
+        with self.lock:
+            return len(self.data.get(encode(key), {}))
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self.data.get(encode(key), {}))
+
+    def lpush(self, key, value):
+        with self.lock:
+            self.data.setdefault(encode(key), []).insert(0, encode(value))
+
+    def lrem(self, key, count, value):
+        with self.lock:  # Only count=0 (remove every occurrence) is needed
+            values = self.data.get(encode(key), [])
+            kept = [item for item in values if item != encode(value)]
+            self.data[encode(key)] = kept
+            return len(values) - len(kept)
+
+    def llen(self, key):
+        with self.lock:
+            return len(self.data.get(encode(key), []))
+
+    def zadd(self, key, mapping):
+        with self.lock:
+            self.data.setdefault(encode(key), {}).update({encode(member): float(score) for member, score in mapping.items()})
+
+    def zrangebyscore(self, key, low, high):
+        with self.lock:
+            scores = self.data.get(encode(key), {})
+            return [member for member, score in sorted(scores.items(), key=lambda item: item[1]) if float(low) <= score <= float(high)]
+
+    def zrem(self, key, member):
+        with self.lock:
+            return int(self.data.get(encode(key), {}).pop(encode(member), None) is not None)
+
+    def zcard(self, key):
+        with self.lock:
+            return len(self.data.get(encode(key), {}))
+
+    def incr(self, key):
+        with self.lock:
+            value = int(self.data.get(encode(key), b"0")) + 1
+            self.data[encode(key)] = encode(value)
+            return value
+
+    def delete(self, key):
+        with self.lock:
+            return int(self.data.pop(encode(key), None) is not None)
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(encode(key))
+
+    def eval(self, script, numkeys, queued, leased, deadline):
+        if script != LEASE_SCRIPT:
+            raise NotImplementedError("MemoryRedis only runs LEASE_SCRIPT")
+        with self.lock:  # Atomic, like a script on a server
+            jobs = self.data.get(encode(queued))
+            if not jobs:
+                return None
+            job_id = jobs.pop()
+            self.data.setdefault(encode(leased), {})[job_id] = float(deadline)
+            return job_id
+
+    def close(self):
+        pass
+
+def encode(value):
+    return value if isinstance(value, bytes) else str(value).encode()
@@ -0,0 +1,115 @@
+"""Checks that email extraction and contact page selection still give the results of the original implementation
+on a fixture corpus of hand-written and generated pages (bench/fixtures/parity.json).
+
+Run from the repository root:
+    python -m bench.parity                  # with the default parser
+    python -m bench.parity --parser lxml    # before opting in to lxml
+    python -m bench.parity --record         # re-record the expected results from the baseline commit
+
+Every page is checked twice: parsed into a tree, and as a fetched Page (which may take the raw body fast path).
+When the original picked among several emails in set order, any email it could have picked is accepted.
+Iframes are served a page without email, the original lost iframe emails to a bug that has since been fixed.
+"""
+import os
+import sys
+import json
+import argparse
+import importlib.util
+import subprocess
+import requests
+from src import utils
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "parity.json")
+BASE_URL = "https://company.com/"
+BASELINE = "1298c34"  # Commit of the original implementation the fixtures are recorded from
+FRAME = "<html><body><p>Nothing to see here</p></body></html>"
+
+def check(parser):
+    """Returns the mismatches between the current code and the recorded results."""
+    with open(FIXTURES, encoding="utf-8") as f:
+        fixtures = json.load(f)["pages"]
+    mismatches = []
+    default_parser = utils.PARSER
+    utils.set_parser(parser)
+    fetched = []
+    def fake_fetch_html(url, *args, **kwargs):
+        fetched.append(url)
+        return utils.parse_html(FRAME), 200
+    fetch_html, utils.fetch_html = utils.fetch_html, fake_fetch_html
+    try:
+        for fixture in fixtures:
+            for mode, soup in (("tree", utils.parse_html(fixture["html"])), ("page", fake_page(fixture["html"]))):
+                email = utils.extract_email(soup, BASE_URL)
+                if email not in fixture["emails"] and not (email is None and not fixture["emails"]):
+                    mismatches.append((fixture["name"], mode, "email", fixture["emails"], email))
+
+            fetched.clear()
+            utils.extract_email_from_contact_page(utils.parse_html(fixture["html"]), BASE_URL, probes=1)
+            contact = fetched[-1] if fetched else None  # The iframes of the contact page are fetched before it
+            if contact != fixture["contact"]:
+                mismatches.append((fixture["name"], "tree", "contact", fixture["contact"], contact))
+    finally:
+        utils.fetch_html = fetch_html
+        utils.set_parser(default_parser)
+    return mismatches
+
+def fake_page(html):
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = html.encode("utf-8")
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    return utils.Page(response)
+
+def record(revision):
+    """Re-records the expected results of every fixture page with src/utils.py as of revision."""
+    source = subprocess.run(["git", "show", f"{revision}:src/utils.py"], capture_output=True, text=True, check=True).stdout
+    spec = importlib.util.spec_from_loader("baseline_utils", loader=None)
+    baseline = importlib.util.module_from_spec(spec)
+    exec(source, baseline.__dict__)
+
+    candidates = []
+    select_primary_email = baseline.select_primary_email
+    def all_picks(email_list, company_url):  # The pick depends on set order, so try every email in front
+        candidates.extend(select_primary_email(email_list[i:] + email_list[:i], company_url) for i in range(len(email_list)))
+        return email_list[0]
+    baseline.select_primary_email = all_picks
+    fetched = []
+    def fake_fetch_html(url, *args, **kwargs):
+        fetched.append(url)
+        return baseline.BeautifulSoup(FRAME, "html.parser"), 200
+    baseline.fetch_html = fake_fetch_html
+
+    with open(FIXTURES, encoding="utf-8") as f:
+        data = json.load(f)
+    for fixture in data["pages"]:
+        candidates.clear()
+        email = baseline.extract_email(baseline.BeautifulSoup(fixture["html"], "html.parser"), BASE_URL)
+        fixture["emails"] = sorted(set(candidates)) if candidates else ([email] if email else [])
+        fetched.clear()
+        baseline.extract_email_from_contact_page(baseline.BeautifulSoup(fixture["html"], "html.parser"), BASE_URL)
+        fixture["contact"] = fetched[-1] if fetched else None
+    data["revision"] = revision
+    with open(FIXTURES, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+        f.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parser", default=utils.PARSER, help="BeautifulSoup parser backend to check")
+    parser.add_argument("--record", action="store_true", help="Re-record the expected results from --revision")
+    parser.add_argument("--revision", default=BASELINE, help="Commit (or ref) of the original implementation")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.revision)
+        return
+    mismatches = check(args.parser)
+    for name, mode, kind, expected, actual in mismatches:
+        print(f"{name} ({mode}): {kind} expected {expected!r}, got {actual!r}")
+    with open(FIXTURES, encoding="utf-8") as f:
+        pages = len(json.load(f)["pages"])
+    print(f"{args.parser}: {pages} pages, {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmarks the crawl against a local stand-in for Europages and the company sites.
+
+Run from the repository root:
+    python -m bench.run --companies 200 --workers 8
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from src import scraper
+from src.drivers import DriverPool
+from src.planner import Planner
+from src.scheduler import HostScheduler
+from src.utils import set_host_scheduler
+from .corpus import build_corpus
+from .server import BenchServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+CONFIG = {
+    "company_tile_class": "tile",
+    "company_link_class": "btn btn--subtle btn--md website-button",
+    "company_name_class": "company-name",
+    "country_selector": "div.flex.gap-1.items-center.mt-0\\.5 > span:nth-of-type(2)",
+    "next_button_class": "button next",
+}
+
+class NullDriver:
+    """Stands in for Chrome when Selenium is disabled: every page renders empty and instantly."""
+    page_source = "<html><body></body></html>"
+    current_url = "about:blank"
+
+    def get(self, url):
+        self.current_url = url
+
+    def find_element(self, *args):
+        return self
+
+    def find_elements(self, *args):
+        return [self]
+
+    def get_attribute(self, name):
+        return ""
+
+    def execute_script(self, *args):
+        return None
+
+    def quit(self):
+        pass
+
+def run(companies=200, per_page=20, workers=8, hosts=32, slow_delay=2.0, seed=0, selenium=False, planner=False):
+    """Crawls the synthetic corpus and returns the benchmark report."""
+    planner = Planner(path=None) if planner else None
+    corpus = build_corpus(companies, seed)
+    expected = {company["name"]: company["email"] for company in corpus}
+    latencies = []
+
+    resolve_company = scraper.resolve_company
+    def timed_resolve_company(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return resolve_company(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    factory = None if selenium else NullDriver
+    cwd = os.getcwd()
+    with BenchServer(corpus, CONFIG, per_page, hosts, slow_delay) as server, tempfile.TemporaryDirectory() as workdir:
+        config = dict(CONFIG, start_url=server.base_url, search_url=server.base_url + "/en/search?q=")
+        set_host_scheduler(HostScheduler(limits={"127.0.0.1": {"concurrency": workers}}))  # The Europages stand-in
+        driver_pool = DriverPool(**({"factory": factory} if factory else {}))
+        os.chdir(workdir)  # Keep the error log out of the repository
+        scraper.resolve_company = timed_resolve_company
+        try:
+            start = time.perf_counter()
+            records = list(scraper.iter_company_info(
+                config["search_url"] + "bench", driver_pool, config, workers, planner=planner
+            ))
+            elapsed = time.perf_counter() - start
+        finally:
+            scraper.resolve_company = resolve_company
+            os.chdir(cwd)
+            driver_pool.close()
+        served = server.stats()
+
+    hits = sum(1 for record in records if record["email"] == expected.get(record["name"]))
+    with_email = sum(1 for email in expected.values() if email)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "companies": companies,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(served["requests"] / elapsed, 2),
+        "companies_per_sec": round(companies / elapsed, 2),
+        "p50_company_sec": round(quantiles[49], 4),
+        "p95_company_sec": round(quantiles[94], 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None,
+        "requests": served["requests"],
+        "mb_served": round(served["bytes"] / 1024**2, 2),
+        "email_hit_rate": round(hits / with_email, 4) if with_email else None,
+        "wrong_emails": len(records) - hits,
+        "planner_decisions": planner.summary()["decisions"] if planner else None,
+    }
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if os.uname().sysname == "Darwin" else peak / 1024  # Bytes on macOS, KiB on Linux
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--per-page", type=int, default=20, help="Companies per listing page")
+    parser.add_argument("--workers", type=int, default=8, help="Companies resolved concurrently")
+    parser.add_argument("--hosts", type=int, default=32, help="Loopback hosts the company sites are spread over")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds the slow sites take to answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--selenium", action="store_true", help="Render with real Chrome instead of a null driver")
+    parser.add_argument("--planner", action="store_true", help="Let the adaptive planner pick the Selenium stages")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = run(args.companies, args.per_page, args.workers, args.hosts, args.slow_delay, args.seed, args.selenium, args.planner)
+    for name, value in report.items():
+        print(f"{name:>20}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import time
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from .corpus import listing_page, profile_page, site_page
+
+class BenchServer:
+    """Local stand-in for Europages and the company sites, serving a synthetic corpus.
+
+    Europages (listing and profile pages) is served on 127.0.0.1, the company sites are spread over
+    the loopback addresses 127.0.0.2 and up so they behave like separate hosts. The servers run in a
+    child process, so they don't count towards the crawler's CPU time and memory.
+    """
+
+    def __init__(self, corpus, config, per_page=20, hosts=8, slow_delay=2.0):
+        self.corpus = corpus
+        self.config = config
+        self.per_page = per_page
+        self.hosts = hosts
+        self.slow_delay = slow_delay
+        self.process = None
+        self.conn = None
+        self.port = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(self, child_conn), daemon=True)
+        self.process.start()
+        self.port = self.conn.recv()
+        return self
+
+    def stats(self):
+        """Returns the number of requests and bytes served so far."""
+        self.conn.send("stats")
+        return self.conn.recv()
+
+    def stop(self):
+        if self.process:
+            self.conn.send("stop")
+            self.process.join(timeout=5)
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def site_url(company, port, hosts):
+    if company["kind"] == "dead_host":
+        return f"http://winery-{company['id']}.invalid/"  # .invalid never resolves
+    return f"http://127.0.0.{2 + company['id'] % hosts}:{port}/site/{company['id']}/"
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like real servers
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):  # The crawler hung up, e.g. between keep-alive requests after an early email stop
+            pass
+
+    def do_GET(self):
+        bench = self.server.bench
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        status, headers, body = 404, {}, "<html><body>Not found</body></html>"
+
+        if url.path == "/en/search":
+            page = int(parse_qs(url.query).get("page", ["0"])[0])
+            status, body = 200, listing_page(bench.corpus, page, bench.per_page, bench.config)
+        elif len(parts) == 3 and parts[:2] == ["en", "company"] and int(parts[2]) < len(bench.corpus):
+            company = bench.corpus[int(parts[2])]
+            status, body = 200, profile_page(company, site_url(company, self.server.server_port, bench.hosts), bench.config)
+        elif len(parts) >= 2 and parts[0] == "site" and int(parts[1]) < len(bench.corpus):
+            company = bench.corpus[int(parts[1])]
+            if company["kind"] == "slow":
+                time.sleep(bench.slow_delay)
+            status, headers, body = site_page(company, "/".join(parts[2:]))
+
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):  # The crawler stopped reading (e.g. early email stop)
+            pass
+        with self.server.lock:
+            self.server.counts["requests"] += 1
+            self.server.counts["bytes"] += len(data)
+
+def serve(bench, conn):
+    """Runs the servers in the child process until the parent asks to stop."""
+    lock = threading.Lock()
+    counts = {"requests": 0, "bytes": 0}
+    servers = []
+    port = 0
+    for host in range(1, bench.hosts + 2):
+        server = ThreadingHTTPServer((f"127.0.0.{host}", port), BenchHandler)
+        server.daemon_threads = True
+        server.bench, server.lock, server.counts = bench, lock, counts
+        port = server.server_port  # Every host listens on the port picked for the first one
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn.send(port)
+
+    while True:
+        message = conn.recv()
+        if message == "stats":
+            with lock:
+                conn.send(dict(counts))
+        else:
+            break
+    for server in servers:
+        server.shutdown()
@@ -1,5 +1,7 @@
-from src.utils import initialize_selenium_driver, save_to_csv
-from src.scraper import collect_company_info
+import argparse
+from src.runner import run_websites
+from src.workqueue import open_queue
+from src.distributed import seed, work, export
 
 # Manually extracting the search_selector from the DOM of a website to use selenium is much less efficient than
 # finding the search url AND using it with requests!
@@ -15,20 +17,44 @@ WEBSITES = {
         "company_name_class": "company-name mt-1.5 mb-0.5 font-display-500 text-neutral-100 hover:no-underline",
         "country_selector": "div.flex.gap-1.items-center.mt-0\\.5 > span:nth-of-type(2)",
         "next_button_class": "button next", 
+        "max_workers": 8,  # Companies resolved concurrently (1 = sequential)
+        "host_limits": {"www.europages.co.uk": {"concurrency": 4, "interval": 0.25}},  # Politeness towards Europages
+        "drivers": 2,  # Headless Chrome instances for the Selenium stages
+        "driver_max_pages": 200,  # Pages rendered by a driver before it is recycled
+        "dns_cache": "output/dns_cache.json",  # Hosts that (don't) resolve, kept between runs (None disables it)
+        "cache_dir": None,  # e.g. "cache" to keep HTTP responses on disk between runs
+        "parser": "html.parser",  # "lxml" parses faster, once `python -m bench.parity --parser lxml` passes
+        "offline": False,  # Only serve responses from the cache (re-run extraction on a previous crawl)
+        "checkpoint": "output/checkpoint.db",  # Progress store to resume interrupted crawls (None disables it)
+        "planner": "output/planner.json",  # Learned Selenium stage success rates (None always runs the full ladder)
+        "output_dir": "output",  # CSVs and metrics of each sector (give other websites their own directory)
     }
 }
 
-config = WEBSITES["europages"]
-driver = initialize_selenium_driver()
-
-for sector in config["sectors"]:
-    info = collect_company_info(config["search_url"] + sector, driver, config)
-    
-    # Save links to CSV
-    save_to_csv(info["links"], f"output/links_{sector}.csv", headers=["url"])
+RUN = {
+    "processes": 2,  # Sectors (of all websites) crawled in parallel, each in its own process with its own drivers
+    "index": "output/index.db",  # Companies resolved by any sector, reused by the others (None disables it)
+    # Distributed crawls (seed/work/export below)
+    "queue": "output/queue.db",  # Work queue shared by the workers of one machine
+    "redis_url": None,  # e.g. "redis://queue-host:6379/0" to share the queue between machines instead
+    "worker_threads": 8,  # Jobs a worker runs concurrently
+}
 
-    # Save names, countries, and emails to CSV
-    data = {"name": info["names"], "country": info["countries"], "email": info["emails"]}
-    save_to_csv(data, f"output/emails_{sector}.csv", headers=["name", "country", "email"])
-    
-driver.quit()
\ No newline at end of file
+if __name__ == "__main__":  # Worker processes import this module too
+    parser = argparse.ArgumentParser(description="Scrapes company emails from the websites configured above.")
+    parser.add_argument("mode", nargs="?", default="local", choices=["local", "seed", "work", "export"],
+                        help="local: crawl on this machine (default). seed: queue the sectors for a distributed crawl, "
+                             "work: run queued jobs (start as many workers as wanted), export: write the CSVs of the results so far")
+    parser.add_argument("--fresh", action="store_true", help="local/seed: start interrupted (or running) crawls over instead of resuming them")
+    args = parser.parse_args()
+    if args.mode == "local":
+        run_websites(WEBSITES, RUN["processes"], RUN["index"], args.fresh)
+    else:
+        with open_queue(RUN["queue"], RUN["redis_url"]) as queue:
+            if args.mode == "seed":
+                seed(queue, WEBSITES, args.fresh)
+            elif args.mode == "work":
+                work(queue, WEBSITES, RUN["worker_threads"])
+            else:
+                export(queue, WEBSITES)
+            print(queue.counts())
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+from .utils import read_body, normalize_url
+from .files import write_atomic
+
+CACHE_DIR = "cache"
+CACHE_TTL = 7 * 24 * 3600  # Seconds an entry is served without asking the server
+CACHE_MAX_AGE = 60 * 24 * 3600  # Seconds after which an entry is evicted, even if it could still be revalidated
+CACHE_MAX_SIZE = 2 * 1024**3  # Bytes of cached bodies before the least recently used entries are evicted
+CACHEABLE_STATUS = {200, 203, 301, 302, 303, 307, 308, 404, 410}
+CACHED_HEADERS = ["Location", "ETag", "Last-Modified", "Content-Type"]
+
+class CacheMiss(requests.exceptions.RequestException):
+    """Raised in offline mode when a URL isn't in the cache."""
+
+class ResponseCache:
+    """Persistent on-disk cache of HTTP responses, keyed by normalized URL.
+
+    Each entry stores the status, the body and the headers needed to follow redirects and revalidate
+    (ETag/Last-Modified). Entries younger than ttl are served as is, older ones are revalidated with a
+    conditional GET. In offline mode every entry is served as is and a miss raises CacheMiss, which makes
+    it possible to re-run the extraction logic against a previous crawl without touching the network.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_age=CACHE_MAX_AGE, max_size=CACHE_MAX_SIZE, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_size = max_size
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.evicting = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self._paths(".body"))
+
+    def get(self, session, url, **kwargs):
+        """Drop-in replacement for session.get(url, **kwargs) that goes through the cache."""
+        key = cache_key(url)
+        entry = self._load(key)
+
+        if entry and (self.offline or time.time() - entry["fetched_at"] < self.ttl):
+            self._touch(key)
+            return entry["response"]
+        if self.offline:
+            raise CacheMiss(f"Not cached: {url}")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry:  # Conditional GET, the server answers 304 if our copy is still valid
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry:
+            self._save(key, url, entry["response"], refresh_only=True)
+            return entry["response"]
+        if response.status_code in CACHEABLE_STATUS:
+            self._save(key, url, response)
+        return response
+
+    def fresh(self, url):
+        """Returns whether get() would answer url from the cache without a request."""
+        if self.offline:
+            return True
+        try:
+            with open(self._path(cache_key(url), ".json"), encoding="utf-8") as f:
+                return time.time() - json.load(f)["fetched_at"] < self.ttl
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def evict(self):
+        """Deletes entries older than max_age, then the least recently used ones until the cache fits max_size."""
+        entries = []
+        now = time.time()
+        for meta_path in self._paths(".json"):
+            key = os.path.basename(meta_path)[:-len(".json")]
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    fetched_at = json.load(f)["fetched_at"]
+                last_used = os.path.getmtime(meta_path)
+            except (OSError, ValueError, KeyError):
+                self._delete(key)
+                continue
+            if now - fetched_at > self.max_age:
+                self._delete(key)
+            else:
+                entries.append((last_used, key))
+
+        for _, key in sorted(entries):
+            if self.size <= self.max_size:
+                break
+            self._delete(key)
+
+    def _load(self, key):
+        try:
+            with open(self._path(key, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(key, ".body"), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.url = meta["url"]
+        response._content = body
+        response._content_consumed = True
+        meta["response"] = response
+        return meta
+
+    def _save(self, key, url, response, refresh_only=False):
+        meta = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+            "fetched_at": time.time(),
+        }
+        os.makedirs(os.path.dirname(self._path(key, ".json")), exist_ok=True)
+        if not refresh_only:
+            body = read_body(response)  # Cached in full (up to MAX_BODY_SIZE), so offline runs see whole pages
+            with self.lock:
+                self.size += len(body) - self._size(key)
+            write_atomic(self._path(key, ".body"), body)
+        write_atomic(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+        if self.size > self.max_size and self.evicting.acquire(blocking=False):  # One eviction pass at a time
+            try:
+                self.evict()
+            finally:
+                self.evicting.release()
+
+    def _touch(self, key):
+        try:
+            os.utime(self._path(key, ".json"))  # The mtime of the metadata file tracks the last use
+        except OSError:
+            pass
+
+    def _delete(self, key):
+        with self.lock:
+            self.size -= self._size(key)
+        for ext in (".json", ".body"):
+            try:
+                os.remove(self._path(key, ext))
+            except OSError:
+                pass
+
+    def _size(self, key):
+        try:
+            return os.path.getsize(self._path(key, ".body"))
+        except OSError:
+            return 0
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    def _paths(self, ext):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(ext):
+                    yield os.path.join(root, name)
+
+def cache_key(url):
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
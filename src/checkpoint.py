@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+
+CHECKPOINT_FILE = "output/checkpoint.db"
+
+class Checkpoint:
+    """SQLite store of crawl progress, so an interrupted crawl can resume where it stopped.
+
+    It records which listing pages have been walked (and the page that follows them) and the outcome of
+    every company profile href on them: the resolved record, or the error that stopped it. A crawl is identified
+    by its scope, the URL of its first listing page, so several sectors can share one file. A crawl that
+    finished is cleared, so the next run of the sector crawls it afresh.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)  # Waits for writers in other processes
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Cheap commits after every company
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                scope TEXT, url TEXT, next_url TEXT,
+                PRIMARY KEY (scope, url)
+            );
+            CREATE TABLE IF NOT EXISTS companies (
+                scope TEXT, href TEXT, page_url TEXT, position INTEGER,
+                link TEXT, name TEXT, country TEXT, email TEXT, outcome TEXT, error TEXT,
+                PRIMARY KEY (scope, page_url, position)
+            );
+        """)
+
+    def page_done(self, scope, url):
+        """Returns whether a listing page has been walked, and the URL of the next page (None on the last page)."""
+        with self.lock:
+            row = self.conn.execute("SELECT next_url FROM pages WHERE scope = ? AND url = ?", (scope, url)).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def mark_page(self, scope, url, next_url):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", (scope, url, next_url))
+
+    def company(self, scope, page_url, position, href):
+        """Returns (resolved, record) for the company href at a position of a listing page.
+        record is None if the company was skipped or failed."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT link, name, country, email, outcome FROM companies "
+                "WHERE scope = ? AND page_url = ? AND position = ? AND href = ?",
+                (scope, page_url, position, href),
+            ).fetchone()
+        if not row:
+            return False, None
+        return True, to_record(row)
+
+    def page_records(self, scope, url):
+        """Returns the records of the companies resolved on a listing page, in listing order."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT link, name, country, email, outcome FROM companies WHERE scope = ? AND page_url = ? ORDER BY position",
+                (scope, url),
+            ).fetchall()
+        return [record for record in map(to_record, rows) if record]
+
+    def companies_done(self, scope, url):
+        """Returns the number of companies of a listing page whose outcome is recorded."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM companies WHERE scope = ? AND page_url = ?", (scope, url)
+            ).fetchone()[0]
+
+    def mark_company(self, scope, href, page_url, position, record, error=None):
+        record = record or {}
+        outcome = "ok" if record else "failed"
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO companies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, href, page_url, position, record.get("link"), record.get("name"), record.get("country"),
+                 record.get("email"), outcome, None if error is None else str(error)),
+            )
+
+    def clear(self, scope):
+        """Forgets the progress of a crawl, so it starts over (e.g. once it finished)."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pages WHERE scope = ?", (scope,))
+            self.conn.execute("DELETE FROM companies WHERE scope = ?", (scope,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def to_record(row):
+    link, name, country, email, outcome = row
+    if outcome != "ok":
+        return None
+    return {"link": link, "name": name, "country": country, "email": email}
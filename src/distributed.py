@@ -0,0 +1,158 @@
+import os
+import time
+import socket
+import threading
+from .utils import CsvSink, fetch_html, extract_href, extract_company_name, extract_location, extract_email, prefetch_hosts
+from .utils import is_success
+from .utils import set_response_cache, set_host_scheduler, set_resolver, set_parser, MAX_WORKERS
+from .utils import set_errors_file, close_error_log
+from .scheduler import HostScheduler
+from .resolver import Resolver
+from .cache import ResponseCache
+from .drivers import DriverPool
+from .planner import Planner
+from .scraper import resolve_site
+
+POLL_INTERVAL = 1  # Seconds an idle worker waits before asking the queue again
+# Errors of resolve_site a retry may fix, besides 429 and 5xx statuses (a company without an email isn't retried)
+TRANSIENT_ERRORS = ("Timeout", "Connection Error", "Host Unavailable", "Request Exception", "Selenium error")
+
+class JobError(Exception):
+    """A job that failed in a way a retry may fix (e.g. a page that couldn't be fetched)."""
+
+def seed(queue, websites, fresh=False):
+    """Queues the first listing page of every sector of every website. Seeding a sector whose crawl is still
+    running does nothing (it carries on), one whose crawl finished starts a new crawl of it: its jobs and
+    results are purged first. With fresh, running crawls are purged and started over too."""
+    for name, config in websites.items():
+        for sector in config["sectors"]:
+            scope = config["search_url"] + sector  # Identifies the crawl, like the checkpoint scope
+            prefixes = [f"{kind}:{scope}:" for kind in HANDLERS]
+            if fresh or not any(queue.pending(prefix) for prefix in prefixes):
+                for prefix in prefixes:
+                    queue.purge(prefix)
+                queue.clear_results(scope)
+            queue.put("listing", {"site": name, "sector": sector, "scope": scope, "url": scope, "page": 0}, key=f"listing:{scope}:{scope}")
+
+def work(queue, websites, threads=MAX_WORKERS):
+    """Runs jobs from the queue on threads until no job is queued or being worked on anymore.
+
+    Several workers (processes, or machines sharing a RedisQueue) can run at once. Each one is as polite
+    towards a host as its host_limits say, so the limits should be divided by the number of workers.
+    Settings that belong to the process (drivers, caches, planner) are taken from the first website.
+    """
+    config = next(iter(websites.values()))
+    limits = {host: limit for site in websites.values() for host, limit in site["host_limits"].items()}
+    set_host_scheduler(HostScheduler(limits=limits))
+    resolver = Resolver(config["dns_cache"]) if config["dns_cache"] else None
+    set_resolver(resolver)
+    set_response_cache(ResponseCache(config["cache_dir"], offline=config["offline"]) if config["cache_dir"] else None)
+    set_parser(config.get("parser", "html.parser"))
+    # Workers on one machine share output_dir, so each one logs to its own file
+    set_errors_file(f"{config.get('output_dir', 'output')}/errors_{socket.gethostname()}_{os.getpid()}.csv")
+    driver_pool = DriverPool(config["drivers"], config["driver_max_pages"])
+    planner = Planner(config["planner"]) if config["planner"] else None
+
+    def run():
+        while True:
+            job = queue.get()
+            if job is None:
+                if not queue.pending():
+                    return
+                time.sleep(POLL_INTERVAL)  # Other workers may still queue jobs
+                continue
+            try:
+                HANDLERS[job.kind](queue, websites[job.payload["site"]], job.payload, driver_pool, planner)
+                queue.ack(job)
+            except Exception as e:
+                print(f"Job {job.kind} {job.payload.get('href') or job.payload['url']} failed (attempt {job.attempts}): {e}")
+                queue.fail(job, e)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        driver_pool.close()
+        close_error_log()
+        if planner:
+            planner.save()
+        if resolver:
+            resolver.close()
+
+def handle_listing(queue, config, job, driver_pool, planner):
+    """Queues a profile job for every company tile of a listing page, and the next listing page."""
+    html, error = fetch_html(job["url"])
+    if not is_success(error):  # Also an error page (e.g. 429 or 503) has no company tiles
+        raise JobError(f"Listing page unavailable: {error}")
+    prefetch_hosts(extract_href(html, config["company_link_class"]))
+    for position, href in enumerate(extract_href(html, config["company_tile_class"])):
+        queue.put("profile", dict(job, href=href, position=position), key=f"profile:{job['scope']}:{href}")
+
+    next_url = extract_href(html, config["next_button_class"])
+    if next_url:
+        next_url = config["start_url"] + next_url[0]
+        queue.put("listing", dict(job, url=next_url, page=job["page"] + 1), key=f"listing:{job['scope']}:{next_url}")
+
+def handle_profile(queue, config, job, driver_pool, planner):
+    """Reads a company profile. Its record is a result right away if the profile shows the email, otherwise
+    the company website is queued for resolution."""
+    href_url = config["start_url"] + job["href"]
+    href_html, error = fetch_html(href_url)
+    if not is_success(error):
+        raise JobError(f"Profile unavailable: {error}")
+    company_link = extract_href(href_html, config["company_link_class"])
+    company_link = company_link[0] if isinstance(company_link, list) else company_link
+    if not company_link:
+        return
+    prefetch_hosts([company_link])
+
+    record = {
+        "link": company_link,
+        "name": extract_company_name(href_html, config["company_name_class"]),
+        "country": extract_location(href_html, config["country_selector"]),
+        "email": extract_email(href_html, href_url),
+    }
+    if record["email"]:
+        queue.add_result(job["scope"], result_key(job), record)
+    else:  # Companies listed more than once share the site job of the first listing
+        queue.put("site", dict(job, record=record), key=f"site:{job['scope']}:{company_link}")
+
+def handle_site(queue, config, job, driver_pool, planner):
+    """Resolves the email of a company on its own website (homepage, contact page, Selenium stages)."""
+    record = job["record"]
+    email, error, company_link = resolve_site(record["link"], job["url"], driver_pool, planner)
+    if email:
+        queue.add_result(job["scope"], result_key(job), dict(record, link=company_link, email=email))
+    elif is_transient(error):
+        raise JobError(f"Site unavailable: {error}")
+
+def is_transient(error):
+    """Whether resolve_site gave up on an error a retry may fix (throttling, server or network errors)."""
+    if isinstance(error, int):
+        return error == 429 or error >= 500
+    return str(error).startswith(TRANSIENT_ERRORS)
+
+HANDLERS = {"listing": handle_listing, "profile": handle_profile, "site": handle_site}
+
+def result_key(job):
+    """Sorts the results of a crawl in listing order."""
+    return f"{job['page']:06d}:{job['position']:04d}"
+
+def export(queue, websites):
+    """Writes the aggregated results of every sector to its CSVs (the same files a local run writes).
+    Can run while workers are still busy, for a partial crawl."""
+    for config in websites.values():
+        output = config.get("output_dir", "output")
+        os.makedirs(output, exist_ok=True)
+        for sector in config["sectors"]:
+            seen = set()
+            with CsvSink(f"{output}/links_{sector}.csv", headers=["url"]) as links, \
+                 CsvSink(f"{output}/emails_{sector}.csv", headers=["name", "country", "email"]) as emails:
+                for record in queue.results(config["search_url"] + sector):
+                    if record["link"] not in seen:  # Avoid duplicates
+                        seen.add(record["link"])
+                        links.write([record["link"]])
+                        emails.write([record["name"], record["country"], record["email"]])
@@ -0,0 +1,86 @@
+import queue
+import threading
+from contextlib import contextmanager
+from .utils import initialize_selenium_driver
+
+DRIVER_POOL_SIZE = 2  # Number of headless Chrome instances
+DRIVER_MAX_PAGES = 200  # Pages rendered by a driver before it is recycled (Chrome leaks memory over time)
+
+class DriverPool:
+    """Pool of headless Chrome drivers that Selenium stages check out and return.
+
+    Drivers are started on first checkout and recycled once they rendered max_pages pages (counted by
+    fetch_html_selenium) or when they crashed, so a single wedged browser never stalls the whole crawl.
+    """
+
+    def __init__(self, size=DRIVER_POOL_SIZE, max_pages=DRIVER_MAX_PAGES, factory=initialize_selenium_driver):
+        self.max_pages = max_pages
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.started = set()  # Drivers currently started
+        self.available = queue.Queue()
+        for _ in range(size):
+            self.available.put(None)  # Empty slot, the driver is started when it is first needed
+
+    @contextmanager
+    def driver(self):
+        """Checks out a driver for the duration of the with block."""
+        driver = self.available.get()
+        crashed = False
+        try:
+            if driver is None:
+                driver = self.factory()
+                with self.lock:
+                    self.started.add(driver)
+            yield driver
+        except Exception:
+            crashed = True
+            raise
+        finally:
+            self._checkin(driver, crashed)
+
+    def _checkin(self, driver, crashed):
+        if driver is None:  # The factory failed, free the slot
+            self.available.put(None)
+            return
+        with self.lock:
+            closed = driver not in self.started  # The pool was closed meanwhile
+            recycle = closed or crashed or pages_rendered(driver) >= self.max_pages or not is_driver_alive(driver)
+            if recycle:
+                self.started.discard(driver)
+        if recycle:
+            quit_driver(driver)
+            driver = None
+        self.available.put(driver)
+
+    def close(self):
+        """Quits all drivers that are currently started."""
+        with self.lock:
+            drivers = list(self.started)
+            self.started.clear()
+        for driver in drivers:
+            quit_driver(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def pages_rendered(driver):
+    """Number of pages fetch_html_selenium rendered with a driver."""
+    return getattr(driver, "pages_rendered", 0)
+
+def is_driver_alive(driver):
+    """Checks whether the browser behind a driver still responds."""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
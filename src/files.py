@@ -0,0 +1,51 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCKS = {}  # One threading lock per lock file, file locks don't exclude threads of the same process everywhere
+LOCKS_LOCK = threading.Lock()
+
+@contextmanager
+def locked(path):
+    """Holds an exclusive lock on path (through path.lock) against other threads and processes, e.g. around a
+    read-merge-write of a file that parallel processes share."""
+    with LOCKS_LOCK:
+        lock = LOCKS.setdefault(path, threading.Lock())
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with lock, open(path + ".lock", "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def read_json(path, default=None):
+    """Reads a JSON file. A missing or unreadable (e.g. truncated) file gives default, so it is rebuilt."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def write_atomic(path, data):
+    """Writes a file so concurrent readers never see it half written. The temporary file is unique per process
+    and thread, so concurrent writers don't write into the same one."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
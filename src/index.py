@@ -0,0 +1,68 @@
+import os
+import time
+import sqlite3
+import threading
+
+INDEX_FILE = "output/index.db"
+INDEX_MAX_AGE = 24 * 3600  # Seconds a resolved company is reused by other sectors and sites
+
+class CompanyIndex:
+    """SQLite index of the companies resolved by every sector and site of a run.
+
+    Many companies are listed under several sectors. The worker processes of a run share this file, so a
+    company resolved under one sector is reused by the others: by its profile URL before the profile is even
+    fetched, and by its website link (e.g. the same company on another directory site) before the site is
+    crawled. Only companies with an email are indexed, failures are retried by each sector.
+    """
+
+    def __init__(self, path=INDEX_FILE, max_age=INDEX_MAX_AGE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)  # Waits for writers in other processes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS companies (
+                profile_url TEXT PRIMARY KEY, link TEXT, name TEXT, country TEXT, email TEXT, resolved_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS companies_link ON companies (link);
+        """)
+
+    def company(self, profile_url):
+        """Returns the record of the company behind a profile URL, or None if it wasn't resolved recently."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT link, name, country, email FROM companies WHERE profile_url = ? AND resolved_at > ?",
+                (profile_url, time.time() - self.max_age),
+            ).fetchone()
+        if not row:
+            return None
+        link, name, country, email = row
+        return {"link": link, "name": name, "country": country, "email": email}
+
+    def email(self, link):
+        """Returns the email found for a company website, or None if it wasn't resolved recently."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT email FROM companies WHERE link = ? AND resolved_at > ? ORDER BY resolved_at DESC LIMIT 1",
+                (link, time.time() - self.max_age),
+            ).fetchone()
+        return row[0] if row else None
+
+    def add(self, profile_url, record):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO companies VALUES (?, ?, ?, ?, ?, ?)",
+                (profile_url, record["link"], record["name"], record["country"], record["email"], time.time()),
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+SELENIUM_STAGES = {"driver_wait", "selenium", "selenium_contact", "gate", "gate_contact"}
+CURRENT = contextvars.ContextVar("company_metrics", default=None)  # Metrics of the company this thread resolves
+
+class CompanyMetrics:
+    """Wall time and bytes per stage of the email fallback ladder for one company, and its outcome."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.bytes = defaultdict(int)
+        self.stages = []  # Stages in the order they ran
+        self.skipped = []  # Stages the planner skipped
+        self.stage = None
+        self.started = time.perf_counter()
+        self.stage_started = self.started
+        self.link = None
+        self.email_stage = None
+        self.error = None
+
+    def enter(self, stage):
+        """Ends the current stage and starts timing the next one."""
+        now = time.perf_counter()
+        if self.stage:
+            self.seconds[self.stage] += now - self.stage_started
+        self.stage = stage
+        self.stage_started = now
+        self.stages.append(stage)
+
+    def result(self, record, error):
+        if record:
+            self.link = record["link"]
+            self.email_stage = self.stage  # The stage that was running when the email turned up
+        else:
+            self.error = error_label(error)
+
+    def close(self):
+        self.enter(None)
+        self.stages.pop()
+        self.total = time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            "link": self.link,
+            "seconds": round(self.total, 4),
+            "stages": {stage: {"seconds": round(self.seconds[stage], 4), "bytes": self.bytes[stage]} for stage in self.stages},
+            "selenium_seconds": round(sum(self.seconds[stage] for stage in SELENIUM_STAGES), 4),
+            "skipped": self.skipped,
+            "email_stage": self.email_stage,
+            "error": self.error,
+        }
+
+class RunMetrics:
+    """Aggregates the per-company metrics of a run. Every company is also appended as a JSON line to
+    companies_file (if given), and the run can be summarized as JSON or as a Prometheus text file.
+    Companies replayed from the checkpoint of an interrupted run are only counted (as replayed): their
+    metrics belong to the run that resolved them."""
+
+    def __init__(self, companies_file=None):
+        self.lock = threading.Lock()
+        self.companies = 0
+        self.replayed = 0
+        self.seconds = 0.0
+        self.stage_runs = Counter()
+        self.stage_seconds = Counter()
+        self.stage_bytes = Counter()
+        self.stage_emails = Counter()
+        self.stage_skips = Counter()
+        self.errors = Counter()
+        self.file = None
+        if companies_file:
+            os.makedirs(os.path.dirname(companies_file) or ".", exist_ok=True)
+            self.file = open(companies_file, "a", encoding="utf-8")
+
+    def add(self, company):
+        with self.lock:
+            self.companies += 1
+            self.seconds += company.total
+            self.stage_runs.update(company.stages)
+            self.stage_seconds.update(company.seconds)
+            self.stage_bytes.update(company.bytes)
+            self.stage_skips.update(company.skipped)
+            if company.email_stage:
+                self.stage_emails[company.email_stage] += 1
+            else:
+                self.errors[company.error] += 1
+            if self.file:
+                self.file.write(json.dumps(company.to_dict()) + "\n")
+
+    def add_replayed(self):
+        with self.lock:
+            self.replayed += 1
+
+    def summary(self):
+        with self.lock:
+            stages = sorted(set(self.stage_runs) | set(self.stage_seconds) | set(self.stage_skips))
+            return {
+                "companies": self.companies,
+                "replayed": self.replayed,
+                "emails": sum(self.stage_emails.values()),
+                "seconds": round(self.seconds, 3),
+                "selenium_seconds": round(sum(self.stage_seconds[stage] for stage in SELENIUM_STAGES), 3),
+                "stages": {
+                    stage: {
+                        "runs": self.stage_runs[stage],
+                        "seconds": round(self.stage_seconds[stage], 3),
+                        "bytes": self.stage_bytes[stage],
+                        "emails": self.stage_emails[stage],
+                        "skips": self.stage_skips[stage],
+                    }
+                    for stage in stages
+                },
+                "errors": dict(self.errors.most_common()),
+            }
+
+    def write_json(self, path):
+        write_text(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path):
+        summary = self.summary()
+        lines = []
+        def metric(name, help_text, samples, kind="counter"):
+            lines.append(f"# HELP scraper_{name} {help_text}")
+            lines.append(f"# TYPE scraper_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"scraper_{name}{labels} {value}")
+
+        stages = summary["stages"]
+        metric("companies_total", "Companies resolved.", [("", summary["companies"])])
+        metric("replayed_companies_total", "Companies replayed from the checkpoint of an interrupted run.", [("", summary["replayed"])])
+        metric("company_seconds_total", "Wall time spent resolving companies.", [("", summary["seconds"])])
+        metric("selenium_seconds_total", "Wall time spent in Selenium stages.", [("", summary["selenium_seconds"])])
+        for key, name, help_text in [
+            ("runs", "stage_runs_total", "Times a stage of the email fallback ladder ran."),
+            ("seconds", "stage_seconds_total", "Wall time spent per stage."),
+            ("bytes", "stage_bytes_total", "Bytes fetched per stage."),
+            ("emails", "stage_emails_total", "Emails found per stage."),
+            ("skips", "stage_skips_total", "Times the planner skipped a stage."),
+        ]:
+            metric(name, help_text, [(f'{{stage="{stage}"}}', values[key]) for stage, values in stages.items()])
+        metric("company_errors_total", "Companies without an email by final error.",
+               [(f'{{error="{escape_label(error)}"}}', count) for error, count in summary["errors"].items()])
+        write_text(path, "\n".join(lines) + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+@contextmanager
+def track_company(run):
+    """Collects the metrics of the company resolved in the with block into run (a RunMetrics, or None)."""
+    if run is None:
+        yield None
+        return
+    company = CompanyMetrics()
+    token = CURRENT.set(company)
+    try:
+        yield company
+    finally:
+        CURRENT.reset(token)
+        company.close()
+        run.add(company)
+
+def stage(name):
+    """Marks the start of a stage for the company being resolved (no-op when metrics are off)."""
+    company = CURRENT.get()
+    if company:
+        company.enter(name)
+
+def skip(name):
+    """Records that a stage was skipped for the company being resolved."""
+    company = CURRENT.get()
+    if company:
+        company.skipped.append(name)
+
+def add_bytes(count):
+    """Counts fetched bytes towards the current stage of the company being resolved."""
+    company = CURRENT.get()
+    if company:
+        company.bytes[company.stage] += count
+
+def error_label(error):
+    """Keeps the kind of an error and drops the details (e.g. "Request Exception: ..." -> "Request Exception")."""
+    return str(error).split(":")[0].strip()
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def write_text(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,150 @@
+import re
+import json
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from .files import locked, read_json, write_atomic
+
+PLANNER_FILE = "output/planner.json"
+SELENIUM_LADDER = ["selenium", "selenium_contact", "gate", "gate_contact"]  # Default order of the Selenium stages
+# A contact stage searches the contact page of the page its render stage produced, so they're planned as pairs
+STAGE_PAIRS = [("selenium", "selenium_contact"), ("gate", "gate_contact")]
+MIN_SAMPLES = 5  # Attempts of a stage on a domain/platform before its success rate is trusted
+MIN_SUCCESS_RATE = 0.05  # Stages that succeed less often than this are skipped
+EXPLORE_RATE = 0.05  # Share of companies that still get the full ladder, so the statistics keep improving
+
+SCRIPT_REGEX = re.compile(rb'<script', re.IGNORECASE)
+NOSCRIPT_REGEX = re.compile(rb'<noscript', re.IGNORECASE)
+AGE_GATE_REGEX = re.compile(
+    rb'age[-_ ]?(gate|verif|check)|legal (drinking )?age|are you (over|of legal|at least)|date of birth|\b18\s*\+|\b(over|older than) 18',
+    re.IGNORECASE,
+)
+GENERATOR_REGEX = re.compile(rb'<meta[^>]+name=["\']generator["\'][^>]+content=["\']\s*([a-zA-Z][\w.-]*)', re.IGNORECASE)
+
+class Planner:
+    """Cost-aware planner for the Selenium stages of the email fallback ladder.
+
+    It picks which Selenium stages to run, and in which order, from cheap signals in the static HTML (no
+    scripts means rendering can't reveal anything new, age-gate markers mean the gate bypass goes first)
+    and from the success rates it learned per domain and per platform (a hosting platform such as
+    plugwine.com, or the generator of the site). Statistics are kept in a JSON file across runs.
+    """
+
+    def __init__(self, path=PLANNER_FILE, explore_rate=EXPLORE_RATE):
+        self.path = path
+        self.explore_rate = explore_rate
+        self.lock = threading.Lock()
+        self.stats = {}  # "domain:x" / "platform:y" -> stage -> [attempts, successes]
+        self.loaded = {}  # Statistics as read from path, save only adds what this planner learned since
+        self.decisions = Counter()
+        self.skipped = Counter()
+        if path:
+            self.stats = read_json(path, {}).get("stats", {})
+            self.loaded = json.loads(json.dumps(self.stats))
+
+    def plan(self, url, body, complete=True):
+        """Returns the plan for a company: the Selenium stages to run in order, and why. body is the static HTML
+        of the homepage (complete=False if only part of it was read). Without one there is nothing to plan from,
+        so None is returned and the full ladder runs."""
+        if not body:
+            with self.lock:
+                self.decisions["no_static"] += 1
+            return None
+        domain = urlparse(url).netloc.lower().removeprefix("www.")
+        platform = fingerprint(url, body)
+        signals = page_signals(body)
+
+        stages, reason = list(SELENIUM_LADDER), "default"
+        if random.random() < self.explore_rate:
+            reason = "explore"
+        elif signals["gate"]:
+            stages, reason = ["gate", "gate_contact"], "gate"  # The gate bypass renders the page too
+        elif complete and not signals["scripts"] and not signals["noscript"]:
+            stages, reason = [], "static"  # Rendering a page without scripts gives the same HTML
+        else:
+            learned = self._learned(f"domain:{domain}") or self._learned(f"platform:{platform}")
+            if learned:
+                stages, reason = plan_learned(learned), "learned"
+
+        with self.lock:
+            self.decisions[reason] += 1
+            self.skipped.update(s for s in SELENIUM_LADDER if s not in stages)
+        return {"stages": stages, "reason": reason, "domain": domain, "platform": platform}
+
+    def record(self, plan, email_stage):
+        """Learns from the outcome of a plan: every stage up to email_stage was attempted, only that one succeeded."""
+        stages = plan["stages"]
+        attempted = stages[:stages.index(email_stage) + 1] if email_stage in stages else stages
+        with self.lock:
+            for key in (f"domain:{plan['domain']}", f"platform:{plan['platform']}"):
+                for stage in attempted:
+                    counts = self.stats.setdefault(key, {}).setdefault(stage, [0, 0])
+                    counts[0] += 1
+                    counts[1] += stage == email_stage
+
+    def _learned(self, key):
+        """Returns the success rate per stage for a key, for the stages with enough attempts."""
+        with self.lock:
+            stats = self.stats.get(key, {})
+            return {stage: successes / attempts for stage, (attempts, successes) in stats.items() if attempts >= MIN_SAMPLES}
+
+    def summary(self):
+        with self.lock:
+            platforms = {key: dict(stages) for key, stages in self.stats.items() if key.startswith("platform:")}
+            return {"decisions": dict(self.decisions), "skipped_stages": dict(self.skipped), "platforms": platforms}
+
+    def save(self, path=None):
+        """Saves the statistics. What other processes saved to the file since it was loaded is kept, so the
+        sectors of a parallel run all contribute."""
+        path = path or self.path
+        with locked(path):  # Other processes don't merge in between
+            stats = read_json(path, {}).get("stats", {})
+            with self.lock:
+                for key, stages in self.stats.items():
+                    for stage, (attempts, successes) in stages.items():
+                        loaded = self.loaded.get(key, {}).get(stage, [0, 0])
+                        counts = stats.setdefault(key, {}).setdefault(stage, [0, 0])
+                        counts[0] += attempts - loaded[0]
+                        counts[1] += successes - loaded[1]
+                self.stats = stats
+                self.loaded = json.loads(json.dumps(stats))
+                data = {"stats": stats, "last_run": {"decisions": dict(self.decisions), "skipped_stages": dict(self.skipped)}}
+            write_atomic(path, json.dumps(data, indent=2).encode("utf-8"))
+
+def plan_learned(rates):
+    """Orders the stage pairs by their best known success rate and drops the stages that rarely succeed.
+    Stages without enough attempts count as promising, so they keep being tried."""
+    pairs = []
+    for render, contact in STAGE_PAIRS:
+        render_rate, contact_rate = rates.get(render, 1.0), rates.get(contact, 1.0)
+        if max(render_rate, contact_rate) < MIN_SUCCESS_RATE:
+            continue
+        # The render stage is needed by its contact stage, the contact stage can go on its own
+        pair = [render] if contact_rate < MIN_SUCCESS_RATE else [render, contact]
+        pairs.append((max(rates.get(render, 0.0), rates.get(contact, 0.0)), pair))
+    pairs.sort(key=lambda item: -item[0])  # Stable, so the default order breaks ties
+    return [stage for _, pair in pairs for stage in pair]
+
+def page_signals(body):
+    """Cheap signals from the raw static HTML of a page."""
+    body = body or b""
+    return {
+        "scripts": len(SCRIPT_REGEX.findall(body)),
+        "noscript": bool(NOSCRIPT_REGEX.search(body)),
+        "gate": bool(AGE_GATE_REGEX.search(body)),
+    }
+
+def fingerprint(url, body):
+    """Identifies the platform a site runs on: the hosting platform for sites on a subdomain of it
+    (vignobleskandler.plugwine.com -> plugwine.com), else the generator meta tag (WordPress, Wix, ...)."""
+    host = (urlparse(url).hostname or "").removeprefix("www.")
+    labels = host.split(".")
+    if not host.replace(".", "").isdigit():  # Not an IP address
+        # Without a public suffix list: a short second-level label (co.uk, com.br) belongs to the suffix
+        size = 3 if len(labels) > 2 and len(labels[-2]) <= 3 else 2
+        registered = ".".join(labels[-size:])
+        if len(labels) > size:
+            return registered
+    generator = GENERATOR_REGEX.search(body or b"")
+    return generator.group(1).decode("ascii").lower() if generator else "unknown"
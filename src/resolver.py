@@ -0,0 +1,114 @@
+import json
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from .files import locked, read_json, write_atomic
+
+DNS_CACHE_FILE = "output/dns_cache.json"
+POSITIVE_TTL = 24 * 3600  # Seconds a resolvable host is trusted
+NEGATIVE_TTL = 3 * 24 * 3600  # Seconds a host that didn't resolve is skipped (expired domains rarely come back)
+RESOLVE_WORKERS = 16  # Parallel DNS lookups
+# getaddrinfo errors that mean the name doesn't exist (EAI_NODATA isn't defined on every platform).
+# Anything else (e.g. EAI_AGAIN) is a temporary failure and isn't cached.
+DEAD_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+class Resolver:
+    """Run-wide DNS cache with positive and negative entries, kept in a JSON file across runs.
+
+    prefetch() resolves hostnames in bulk on a background pool, so lookups overlap with the crawl, and
+    is_dead() lets fetch_html skip hosts that are known not to resolve without opening a socket.
+    """
+
+    def __init__(self, path=DNS_CACHE_FILE, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # host -> {"alive": bool, "expires": timestamp}
+        self.pending = {}  # host -> future of a lookup in flight
+        self.executor = ThreadPoolExecutor(max_workers=RESOLVE_WORKERS, thread_name_prefix="resolver")
+        if path:
+            self.entries = live_entries(read_json(path, {}))
+
+    def prefetch(self, urls):
+        """Starts resolving the hosts of the given URLs in the background (hosts already known are skipped)."""
+        with self.lock:
+            for host in {hostname(url) for url in urls}:
+                if host and self._cached(host) is None and host not in self.pending:
+                    self.pending[host] = self.executor.submit(self._lookup, host)
+
+    def is_dead(self, url):
+        """Returns whether the URL's host is known not to resolve. Waits for a lookup of it that is in
+        flight, but never starts one itself (requests resolves hosts anyway)."""
+        host = hostname(url)
+        with self.lock:
+            alive = self._cached(host)
+            future = self.pending.get(host)
+        if alive is None and future is not None:
+            alive = future.result()
+        return alive is False
+
+    def resolve(self, url):
+        """Looks the URL's host up now and caches the outcome, e.g. after a request failed to resolve it
+        (a temporary resolver failure isn't cached, a name that doesn't exist is)."""
+        host = hostname(url)
+        return self._lookup(host) if host else True
+
+    def _lookup(self, host):
+        try:
+            socket.getaddrinfo(host, None)
+            alive = True
+        except socket.gaierror as e:
+            alive = False if e.errno in DEAD_ERRORS else None
+        except (OSError, UnicodeError):
+            alive = None
+        with self.lock:
+            self.pending.pop(host, None)
+            if alive is not None:
+                self._store(host, alive)
+        return alive
+
+    def _cached(self, host):
+        entry = self.entries.get(host)
+        if entry and entry["expires"] > time.time():
+            return entry["alive"]
+        return None
+
+    def _store(self, host, alive):
+        ttl = self.positive_ttl if alive else self.negative_ttl
+        self.entries[host] = {"alive": alive, "expires": time.time() + ttl}
+
+    def save(self):
+        """Saves the entries. Entries other processes saved to the file meanwhile are kept, the one that expires
+        last wins for a host both know, so the sectors of a parallel run all contribute."""
+        if not self.path:
+            return
+        with locked(self.path):  # Other processes don't merge in between
+            entries = live_entries(read_json(self.path, {}))
+            with self.lock:
+                for host, entry in self.entries.items():
+                    if host not in entries or entry["expires"] >= entries[host]["expires"]:
+                        entries[host] = entry
+                self.entries = entries
+                data = json.dumps(entries)
+            write_atomic(self.path, data.encode("utf-8"))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.save()
+
+def live_entries(entries):
+    """The entries of a saved cache that haven't expired (malformed ones are dropped)."""
+    now = time.time()
+    if not isinstance(entries, dict):
+        return {}
+    return {host: entry for host, entry in entries.items() if isinstance(entry, dict) and entry.get("expires", 0) > now}
+
+def hostname(url):
+    """Hostname of a URL, None for IP addresses (they need no lookup)."""
+    host = (urlparse(url).hostname or "").lower()
+    if not host or host.replace(".", "").isdigit() or ":" in host:
+        return None
+    return host
@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .utils import ParquetSink, export_csv, set_response_cache, set_host_scheduler, set_resolver, set_parser
+from .utils import set_errors_file, close_error_log
+from .scheduler import HostScheduler
+from .resolver import Resolver
+from .cache import ResponseCache
+from .drivers import DriverPool
+from .checkpoint import Checkpoint
+from .metrics import RunMetrics
+from .planner import Planner
+from .index import CompanyIndex, INDEX_FILE
+from .scraper import iter_company_info
+
+RUN_PROCESSES = 2  # Sectors crawled at the same time, each in its own process
+
+def run_websites(websites, processes=RUN_PROCESSES, index_path=INDEX_FILE, fresh=False):
+    """Crawls every sector of every website, spreading the (website, sector) jobs over worker processes.
+    The processes share a CompanyIndex, so companies listed under several sectors are only resolved once.
+    With fresh, interrupted crawls start over instead of resuming from the checkpoint.
+    Returns the number of companies written per job."""
+    jobs = [(name, sector) for name, config in websites.items() for sector in config["sectors"]]
+    processes = max(1, min(processes, len(jobs)))
+    results = {}
+    if processes == 1:
+        for name, sector in jobs:
+            results[name, sector] = crawl_sector(websites[name], sector, processes, index_path, fresh)
+        return results
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(crawl_sector, websites[name], sector, processes, index_path, fresh): (name, sector) for name, sector in jobs}
+        for future in as_completed(futures):
+            name, sector = futures[future]
+            try:
+                results[name, sector] = future.result()
+                print(f"{name}/{sector}: {results[name, sector]} companies")
+            except Exception as e:  # One broken sector doesn't stop the others
+                print(f"Failed to crawl {name}/{sector}: {e}")
+    return results
+
+def crawl_sector(config, sector, processes=1, index_path=INDEX_FILE, fresh=False):
+    """Crawls one sector of a website and streams its companies to Parquet chunks in companies_<sector>/, then
+    derives the sector's CSVs from them. With fresh, progress checkpointed by an interrupted run is dropped.
+    Returns the number of companies."""
+    output = config.get("output_dir", "output")
+    set_host_scheduler(HostScheduler(limits=share_limits(config["host_limits"], processes)))
+    resolver = Resolver(config["dns_cache"]) if config["dns_cache"] else None
+    set_resolver(resolver)
+    set_response_cache(ResponseCache(config["cache_dir"], offline=config["offline"]) if config["cache_dir"] else None)
+    set_parser(config.get("parser", "html.parser"))
+    set_errors_file(f"{output}/errors_{sector}.csv")  # Sectors run in parallel processes, each logs to its own file
+    driver_pool = DriverPool(config["drivers"], config["driver_max_pages"])
+    checkpoint = Checkpoint(config["checkpoint"]) if config["checkpoint"] else None
+    if checkpoint and fresh:
+        checkpoint.clear(config["search_url"] + sector)
+    metrics = RunMetrics(f"{output}/metrics_companies_{sector}.jsonl")  # Time, bytes and outcome per stage of every company
+    planner = Planner(config["planner"]) if config["planner"] else None
+    index = CompanyIndex(index_path) if index_path else None
+
+    companies = 0
+    try:
+        # Stream each company to disk in chunks as soon as it is resolved, readable while the crawl runs
+        with ParquetSink(f"{output}/companies_{sector}", columns=["link", "name", "country", "email"]) as sink:
+            # Resumed crawls replay the checkpointed companies, so the output is complete again
+            records = iter_company_info(config["search_url"] + sector, driver_pool, config, config["max_workers"], checkpoint, metrics, planner, index)
+            for record in records:
+                sink.write(record)
+                companies += 1
+        export_csv(f"{output}/companies_{sector}", f"{output}/links_{sector}.csv", f"{output}/emails_{sector}.csv")
+    finally:
+        driver_pool.close()
+        metrics.write_json(f"{output}/metrics_{sector}.json")
+        metrics.write_prometheus(f"{output}/metrics_{sector}.prom")
+        metrics.close()
+        close_error_log()
+        if planner:
+            planner.save()
+        for store in (checkpoint, resolver, index):
+            if store:
+                store.close()
+    return companies
+
+def share_limits(limits, processes):
+    """Splits per-host limits between the processes of a run, so together they stay as polite as one process."""
+    shared = {}
+    for host, limit in limits.items():
+        shared[host] = dict(limit)
+        if "concurrency" in limit:
+            shared[host]["concurrency"] = max(1, limit["concurrency"] // processes)
+        if "interval" in limit:
+            shared[host]["interval"] = limit["interval"] * processes
+    return shared
@@ -0,0 +1,137 @@
+import time
+import threading
+import requests
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+HOST_CONCURRENCY = 2  # Requests in flight per host
+HOST_INTERVAL = 0.0  # Minimum seconds between the starts of two requests to a host
+MAX_INTERVAL = 30.0  # Cap on the interval adaptive backoff grows to
+BACKOFF_FACTOR = 2.0  # Interval multiplier after a throttled or failed request
+MAX_WAIT = 60.0  # Seconds a request may wait for its host, after that the host is given up on for now
+CIRCUIT_THRESHOLD = 3  # Consecutive timeouts/connection errors that open a host's circuit breaker
+CIRCUIT_COOLDOWN = 300.0  # Seconds a circuit stays open before the host gets another chance
+THROTTLE_STATUS = {429, 503}
+
+class HostUnavailable(requests.exceptions.RequestException):
+    """Raised instead of sending a request to a host whose circuit is open or that asked us to wait too long."""
+
+class HostState:
+    """Politeness state of a single host: concurrency, request rate, backoff and circuit breaker."""
+
+    def __init__(self, host, concurrency, interval):
+        self.host = host
+        self.concurrency = concurrency
+        self.base_interval = interval
+        self.interval = interval
+        self.cond = threading.Condition()
+        self.active = 0
+        self.next_start = 0.0
+        self.failures = 0  # Consecutive timeouts/connection errors
+        self.open_until = 0.0
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if self.open_until > now:
+                    raise HostUnavailable(f"Circuit open for {self.host}")
+                if self.next_start - now > MAX_WAIT:
+                    raise HostUnavailable(f"{self.host} asked to wait {self.next_start - now:.0f}s")
+                if self.active < self.concurrency and now >= self.next_start:
+                    self.active += 1
+                    self.next_start = now + self.interval
+                    return
+                self.cond.wait(self.next_start - now if self.active < self.concurrency else None)
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def success(self):
+        with self.cond:
+            self.failures = 0
+            self.interval = max(self.base_interval, self.interval / BACKOFF_FACTOR)  # Recover gradually
+
+    def throttled(self, retry_after=None):
+        """The host answered 429/503: wait as long as it asked (or back off exponentially) before the next request."""
+        with self.cond:
+            self.interval = min(MAX_INTERVAL, max(self.interval * BACKOFF_FACTOR, 1.0))
+            delay = retry_after if retry_after is not None else self.interval
+            self.next_start = max(self.next_start, time.monotonic() + delay)
+            self.cond.notify_all()
+
+    def failure(self):
+        """A timeout or connection error: back off, and open the circuit if the host keeps failing."""
+        with self.cond:
+            self.failures += 1
+            self.interval = min(MAX_INTERVAL, max(self.interval * BACKOFF_FACTOR, 1.0))
+            if self.failures >= CIRCUIT_THRESHOLD:
+                self.open_until = time.monotonic() + CIRCUIT_COOLDOWN
+                self.failures = CIRCUIT_THRESHOLD - 1  # After the cooldown, one more failure reopens it
+            self.cond.notify_all()
+
+class HostScheduler:
+    """Host-aware scheduler for concurrent crawling. Every request waits for a slot of its host, which
+    enforces the host's concurrency and request rate, backs off on throttling (honoring Retry-After)
+    and errors, and fails fast for hosts whose circuit breaker is open.
+
+    limits maps host names to {"concurrency": ..., "interval": ...} for hosts that need other settings
+    than the defaults (e.g. a stricter rate for the directory site that is crawled the most).
+    """
+
+    def __init__(self, concurrency=HOST_CONCURRENCY, interval=HOST_INTERVAL, limits=None):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.limits = {host.lower(): limit for host, limit in (limits or {}).items()}
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        with self.lock:
+            if host not in self.hosts:
+                limit = self.limits.get(host, {})
+                self.hosts[host] = HostState(host, limit.get("concurrency", self.concurrency), limit.get("interval", self.interval))
+            return self.hosts[host]
+
+    @property
+    def max_concurrency(self):
+        """Largest number of connections a single host may need, to size the connection pools."""
+        return max([self.concurrency] + [limit.get("concurrency", self.concurrency) for limit in self.limits.values()])
+
+    @contextmanager
+    def slot(self, url):
+        """Holds a request slot of the URL's host for the duration of the with block."""
+        state = self.host(url)
+        state.acquire()
+        try:
+            yield state
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            state.failure()
+            raise
+        finally:
+            state.release()
+
+    def report(self, url, status_code, retry_after=None):
+        """Feeds the status of a response back into its host's backoff."""
+        state = self.host(url)
+        if status_code in THROTTLE_STATUS:
+            state.throttled(parse_retry_after(retry_after))
+        else:
+            state.success()
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (seconds or an HTTP date) into seconds, None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -1,82 +1,260 @@
-from .utils import fetch_html, extract_href, extract_company_name, extract_location, extract_email, add_company_to_csv
-from .utils import extract_email_from_contact_page, fetch_html_selenium, homepage_fallback
-
-def collect_company_info(url, driver, config, company_info={}):
-    """Recursively collects company info."""
-
-    if not company_info:
-        company_info["links"] = []
-        company_info["names"] = []
-        company_info["countries"] = []
-        company_info["emails"] = []
-
-    html, _ = fetch_html(url)
-    hrefs = extract_href(html, config["company_tile_class"]) # if config["company_tile_class"] else extract_href(html, config["company_link_class"])
-    
-    for href in hrefs:
-        try:
-            href_url = config["start_url"] + href
-            href_html, _ = fetch_html(href_url) # if config["company_tile_class"] else html
-            company_link = extract_href(href_html, config["company_link_class"]) # if config["company_tile_class"] else href
-            company_link = company_link[0] if isinstance(company_link, list) else company_link  # Ensure it's a string
-            if not company_link or company_link in company_info["links"]:  # Avoid duplicates
-                continue
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import track_company, stage, skip
+from .planner import SELENIUM_LADDER
+from .utils import Page, fetch_html, extract_href, extract_company_name, extract_location, extract_email, add_company_to_csv
+from .utils import extract_email_from_contact_page, fetch_html_selenium, homepage_fallback, prefetch_hosts, is_success
+
+LISTING_PREFETCH = 2  # Listing pages fetched and parsed ahead of the companies being resolved
+# Outcomes a retry can't change, the only failures the checkpoint keeps: no email on pages that were fetched fine
+FINAL_ERRORS = (200, "Duplicate", "No company link", "No contact page found")
+
+def iter_company_info(url, driver_pool, config, max_workers=1, checkpoint=None, metrics=None, planner=None, index=None):
+    """Walks the listing pages starting at url and yields a record for each company as soon as it is resolved.
+
+    With max_workers > 1 the companies of each listing page are resolved concurrently. Selenium stages check
+    out a driver from driver_pool. Records are yielded in listing order either way. With a checkpoint, pages
+    and companies completed by an earlier run are replayed from it instead of being crawled again. With
+    metrics (a RunMetrics), the time, bytes and outcome of every stage are recorded per company. With a
+    planner, the Selenium stages are picked per company instead of always running the whole ladder. With an
+    index (a CompanyIndex), companies resolved by other sectors or sites are reused instead of crawled again.
+    Once the walk reaches the last page without missing a listing page, the crawl is cleared from the
+    checkpoint, so the next run crawls the sector afresh instead of replaying it.
+    """
+    scope = url  # Identifies this crawl in the checkpoint
+    seen = set()  # Links of the companies yielded so far
+    complete = True  # Every listing page so far was fetched or replayed
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for url, hrefs, next_url, page_done in iter_listing_pages(url, config, checkpoint, scope):
+            if page_done:
+                records = checkpoint.page_records(scope, url)
+            else:
+                jobs = [(href, position, url) for position, href in enumerate(hrefs)]
+
+                if max_workers > 1:
+                    # Workers skip companies from earlier pages, duplicates within this page are dropped below
+                    snapshot = frozenset(seen)
+                    records = executor.map(lambda job: resume_company(*job, driver_pool, config, snapshot, checkpoint, scope, metrics, planner, index), jobs)
+                else:
+                    records = (resume_company(*job, driver_pool, config, seen, checkpoint, scope, metrics, planner, index) for job in jobs)
+
+            for record in records:
+                if record and record["link"] not in seen:
+                    seen.add(record["link"])
+                    yield record
+
+            # Pages that failed (None), or with companies that failed transiently, aren't marked, so a restart retries them
+            if checkpoint and page_done is False and checkpoint.companies_done(scope, url) >= len(hrefs):
+                checkpoint.mark_page(scope, url, next_url)
+            complete = complete and page_done is not None
+
+    if checkpoint and complete:  # Finished: the next run is a new crawl, not a resume of this one
+        checkpoint.clear(scope)
 
-            email = extract_email(href_html, href_url)
-            if not email:  # External link logic – if no email on Europages, go to the company’s actual website.
-                company_html, error = fetch_html(company_link)
-
-                if not company_html and "Connection Error" not in error:
-                    if not error == "DNS":  
-                        add_company_to_csv(company_link, error)  # Troubleshooting: log the error
-                    continue
-                
-                if error == 403 and "Forbidden" in company_html.text:
-                    continue
-
-                elif error == 404:
-                    new_company_link = homepage_fallback(url)
-                    if new_company_link == company_link or not new_company_link:
-                        continue
-                    company_link = new_company_link
-                    company_html, error = fetch_html(company_link)
-
-                elif error == 503 or error == 500: # No need to log 503 and 500 errors as they need no troubleshooting
-                    continue
-                
-                email = extract_email(company_html, company_link)
-
-                if not email:  # CONTACT PAGE LOGIC (not computationally intensive)
-                    email, error = extract_email_from_contact_page(company_html, company_link)
-
-                if not email:  # SELENIUM (computationally intensive)
-                    company_html, error, driver = fetch_html_selenium(driver, company_link)  # e.g.: https://vinosonline.es/es/ (could've extracted email from initial page w/ selenium)
-                    email = extract_email(company_html, company_link)
-
-                if not email:
-                    email, error = extract_email_from_contact_page(company_html, company_link, driver)
-
-                if not email:
-                    company_html, error, driver = fetch_html_selenium(driver, bypass_gate=True)  # Try to bypass any gate that might be blocking the request
-                    email = extract_email(company_html, company_link)
-
-                if not email:
-                    email, error = extract_email_from_contact_page(company_html, company_link, driver=driver)  # e.g.: https://vignobleskandler.plugwine.com/
-
-                if not email:
-                    add_company_to_csv(company_link, error)  # error == 200 ==> No email found
-                    continue
-            
-            company_info["links"].append(company_link)
-            company_info["names"].append(extract_company_name(href_html, config["company_name_class"]))
-            company_info["countries"].append(extract_location(href_html, config["country_selector"]))
-            company_info["emails"].append(email)
+def iter_listing_pages(url, config, checkpoint=None, scope=None, prefetch=LISTING_PREFETCH):
+    """Walks the listing pages starting at url and yields (url, hrefs, next_url, page_done) for each of them.
 
+    A background thread fetches and parses up to prefetch pages ahead, so the next page is ready by the time the
+    companies of the current one are resolved. Pages the checkpoint has are yielded with page_done True and
+    aren't fetched. page_done is None for a page that couldn't be fetched or wasn't a 2xx (e.g. throttled).
+    """
+    pages = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def walk(url):
+        try:
+            while url and not stop.is_set():
+                page_done, next_url = checkpoint.page_done(scope, url) if checkpoint else (False, None)
+                hrefs = None
+                if not page_done:
+                    html, error = fetch_html(url)
+                    hrefs = extract_href(html, config["company_tile_class"]) # if config["company_tile_class"] else extract_href(html, config["company_link_class"])
+                    prefetch_hosts(extract_href(html, config["company_link_class"]))  # Website links shown on the listing, if any
+                    next_url = extract_href(html, config["next_button_class"])
+                    next_url = config["start_url"] + next_url[0] if next_url else None
+                    page_done = False if html and is_success(error) else None
+                put((url, hrefs, next_url, page_done))
+                url = next_url
         except Exception as e:
-            print(f"Failed to extract company link from {config['start_url'] + href}: {e}")
-            add_company_to_csv(company_link, str(e))  # Log the error for troubleshooting
+            put(e)
+        put(None)
+
+    walker = threading.Thread(target=walk, args=(url,), daemon=True)
+    walker.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()  # Also when the caller stops early
+
+def resume_company(href, position, url, driver_pool, config, seen, checkpoint=None, scope=None, metrics=None, planner=None, index=None):
+    """Resolves a company tile, or returns its outcome from the checkpoint if an earlier run resolved it.
+    Transient failures (timeouts, throttling, unreachable hosts) aren't checkpointed, so a restart retries them."""
+    if checkpoint:
+        resolved, record = checkpoint.company(scope, url, position, href)
+        if resolved:
+            if metrics:
+                metrics.add_replayed()
+            return record
+
+    with track_company(metrics) as company:
+        record, error = resolve_company(href, driver_pool, config, url, seen, planner, index)
+        if company:
+            company.result(record, error)
+    if checkpoint and (record or error in FINAL_ERRORS):
+        checkpoint.mark_company(scope, href, url, position, record, error)
+    return record
+
+def collect_company_info(url, driver_pool, config, max_workers=1, checkpoint=None, metrics=None, planner=None, index=None):
+    """Collects the info of all companies into links, names, countries and emails lists."""
+    company_info = {"links": [], "names": [], "countries": [], "emails": []}
+    for record in iter_company_info(url, driver_pool, config, max_workers, checkpoint, metrics, planner, index):
+        add_record(company_info, record)
+    return company_info
+
+def add_record(company_info, record):
+    """Appends a resolved company record to the company info lists."""
+    company_info["links"].append(record["link"])
+    company_info["names"].append(record["name"])
+    company_info["countries"].append(record["country"])
+    company_info["emails"].append(record["email"])
+
+def resolve_company(href, driver_pool, config, url, seen=(), planner=None, index=None):
+    """Resolves a single company tile to a record with its link, name, country and email.
+    Returns (record, error), where record is None if the company is a duplicate or no email could be found."""
+    company_link = None
+    try:
+        href_url = config["start_url"] + href
+        if index:  # Resolved under another sector already
+            stage("index")
+            record = index.company(href_url)
+            if record:
+                return (None, "Duplicate") if record["link"] in seen else (record, None)
+
+        stage("profile")
+        href_html, error = fetch_html(href_url) # if config["company_tile_class"] else html
+        if not is_success(error):
+            return None, error  # e.g. throttled or circuit open, not a profile without link
+        company_link = extract_href(href_html, config["company_link_class"]) # if config["company_tile_class"] else href
+        company_link = company_link[0] if isinstance(company_link, list) else company_link  # Ensure it's a string
+        if not company_link:
+            return None, "No company link"
+        if company_link in seen:  # Avoid duplicates
+            return None, "Duplicate"
+        prefetch_hosts([company_link])  # Resolves the host while the profile page is searched
+
+        email = extract_email(href_html, href_url)
+        if not email and index:  # The same website listed by another site
+            stage("index")
+            email = index.email(company_link)
+        if not email:  # External link logic – if no email on Europages, go to the company’s actual website.
+            email, error, company_link = resolve_site(company_link, url, driver_pool, planner)
+            if not email:
+                return None, error
+
+        record = {
+            "link": company_link,
+            "name": extract_company_name(href_html, config["company_name_class"]),
+            "country": extract_location(href_html, config["country_selector"]),
+            "email": email,
+        }
+        if index:
+            index.add(href_url, record)
+        return record, None
+
+    except Exception as e:
+        print(f"Failed to extract company link from {config['start_url'] + href}: {e}")
+        add_company_to_csv(company_link, str(e))  # Log the error for troubleshooting
+        return None, str(e)
+
+def resolve_site(company_link, url, driver_pool, planner=None):
+    """Searches a company's own website for its email: homepage, contact page, then the Selenium stages.
+    Returns (email, error, company_link), where company_link is the page the email was searched on last
+    (the homepage replaces a link that is gone)."""
+    stage("homepage")
+    company_html, error = fetch_html(company_link, stop_on_email=True)
+
+    if not company_html and "Connection Error" not in error:
+        if not error == "DNS":  
+            add_company_to_csv(company_link, error)  # Troubleshooting: log the error
+        return None, error, company_link
+
+    if error == 403 and "Forbidden" in company_html.text:
+        return None, error, company_link
+
+    elif error == 404:
+        new_company_link = homepage_fallback(url)
+        if new_company_link == company_link or not new_company_link:
+            return None, error, company_link
+        company_link = new_company_link
+        company_html, error = fetch_html(company_link, stop_on_email=True)
+
+    elif error == 503 or error == 500: # No need to log 503 and 500 errors as they need no troubleshooting
+        return None, error, company_link
+
+    # The planner only reads a homepage that was fetched, not an error page or the nothing of a connection error
+    homepage = company_html if isinstance(company_html, Page) and is_success(error) else None
+    email = extract_email(company_html, company_link)
+
+    if not email:  # CONTACT PAGE LOGIC (not computationally intensive)
+        stage("contact")
+        email, error = extract_email_from_contact_page(company_html, company_link)
+
+    if not email:  # SELENIUM (computationally intensive), only the stages the planner expects to help
+        plan = planner.plan(company_link, homepage and homepage.body, complete=bool(homepage) and not homepage.truncated) if planner else None
+        stages = plan["stages"] if plan else SELENIUM_LADDER
+        for name in SELENIUM_LADDER:
+            if name not in stages:
+                skip(name)
+
+        email_stage = None
+        if stages:
+            stage("driver_wait")
+            with driver_pool.driver() as driver:  # A driver renders one page at a time
+                email, error, email_stage = resolve_with_selenium(driver, company_link, stages)
+        if plan:
+            planner.record(plan, email_stage)
+
+    if not email:
+        add_company_to_csv(company_link, error)  # error == 200 ==> No email found
+        return None, error, company_link
+    return email, error, company_link
+
+def resolve_with_selenium(driver, company_link, stages=SELENIUM_LADDER):
+    """Runs the Selenium stages of the email fallback ladder (computationally intensive) in the given order.
+    Returns (email, error, stage), where stage is the one that found the email."""
+    company_html, email, error = None, None, None
+    for name in stages:
+        stage(name)
+        if name == "selenium":
+            company_html, error, driver = fetch_html_selenium(driver, company_link)  # e.g.: https://vinosonline.es/es/ (could've extracted email from initial page w/ selenium)
+            email = extract_email(company_html, company_link)
+
+        elif name == "gate":  # Try to bypass any gate that might be blocking the request, on the page rendered last
+            url = None if company_html is not None else company_link
+            company_html, error, driver = fetch_html_selenium(driver, url, bypass_gate=True)
+            email = extract_email(company_html, company_link)
+
+        else:  # Contact page of the page rendered last, e.g.: https://vignobleskandler.plugwine.com/ for gate_contact
+            if company_html is None:
+                company_html, error, driver = fetch_html_selenium(driver, company_link)
+            email, error = extract_email_from_contact_page(company_html, company_link, driver=driver)
 
-    next_url = extract_href(html, config["next_button_class"])
-    if next_url:
-        return collect_company_info(config["start_url"] + next_url[0], driver, config, company_info)
-    return company_info
\ No newline at end of file
+        if email:
+            return email, error, name
+    return None, error, None
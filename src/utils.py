@@ -1,22 +1,44 @@
 import os
 import re
+import csv
+import glob
 import base64
+import codecs
+import atexit
+import threading
+import contextvars
 import requests
-import pandas as pd
 from bs4 import BeautifulSoup
-from bs4 import NavigableString
-from urllib.parse import urlparse, urljoin
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from bs4 import NavigableString, CData
+from urllib.parse import urlparse, urljoin, urlunparse, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from .metrics import add_bytes
+from .scheduler import HostScheduler, HostUnavailable
+# selenium, webdriver_manager, pandas and pyarrow are imported by the functions that need them, so runs that never
+# render a page (or write a DataFrame) don't pay for importing them
 
 TIMEOUT = 10
+PAGE_LOAD_TIMEOUT = 3 * TIMEOUT  # Selenium gives up on pages that keep loading (e.g. wedged scripts)
+LIGHT_RENDER = True  # Render without images/fonts/media/trackers and extract in the page, see fetch_html_selenium
+RENDER_WAIT = 3  # Seconds a light render waits for an email to show up once the DOM is ready
+DRIVER_PATH_FILE = "output/chromedriver_path.txt"  # chromedriver installed by an earlier run, reused without a lookup
+CHROMEDRIVER = None  # chromedriver path used by this run, see chromedriver_path
+DRIVER_PATH_LOCK = threading.Lock()
 RETRIES = 3
+MAX_REDIRECTS = 5  # Redirect hops followed before giving up
+MAX_BODY_SIZE = 2 * 1024**2  # Bytes of a response body that are read at most, the rest of huge pages is ignored
+CHUNK_SIZE = 64 * 1024  # Bytes read at a time when streaming a response body
+MAX_WORKERS = 8  # Number of companies resolved concurrently
+POOL_HOSTS = 4 * MAX_WORKERS  # Hosts whose connection pools are kept open (each worker visits a few hosts)
 SESSION = requests.Session()  # Improve performance by reusing the session
+SCHEDULER = HostScheduler()  # Per-host concurrency, rate, backoff and circuit breaking, see set_host_scheduler
+RESPONSE_CACHE = None  # Optional ResponseCache in front of SESSION.get, see set_response_cache
+CONTACT_PROBES = 3  # Contact page candidates fetched concurrently (1 = only the best one, and no conventional paths)
+RESOLVER = None  # Optional Resolver that remembers hosts which don't resolve, see set_resolver
+ERROR_BATCH_SIZE = 50  # Number of error rows buffered before they are flushed to disk
+ERRORS_FILE = "output/errors.csv"  # CSV add_company_to_csv logs to, see set_errors_file
+ROW_GROUP_SIZE = 200  # Records per Parquet chunk file, what readers of a running crawl lag behind at most
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -25,69 +47,349 @@ HEADERS = {
     )
 }
 
+PARSER = "html.parser"  # BeautifulSoup parser backend, see set_parser
+TEXT_TYPES = (NavigableString, CData)  # String types get_text() considers visible (no comments, scripts, styles)
+
 COOKIE = "cookie"
 EMAIL_REGEX = r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
+# EMAIL_REGEX for raw response bodies, including the obfuscations normalize_text undoes. The lookbehind only
+# lets matches start at the beginning of a run of local part characters, which keeps long runs (e.g. inline
+# base64 images) from making the search quadratic.
+EMAIL_BYTES_REGEX = re.compile(
+    rb'(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]{1,64}(?:@|\s+@\s+|\s*(?:\(at\)|\[at\]|\{at\})\s*)[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
+)
+AT_BYTES_REGEX = re.compile(rb'\s*(?:@|\(at\)|\[at\]|\{at\})\s*')
+# Parts of a raw body extract_email doesn't read as text: scripts, styles and comments, and tags (of which only
+# mailto links and base64 encoded attributes count)
+HIDDEN_BYTES_REGEX = re.compile(rb'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->', re.DOTALL | re.IGNORECASE)
+TAG_BYTES_REGEX = re.compile(rb'<[^>]*>')
+HIDDEN_START_BYTES_REGEX = re.compile(rb'<script\b|<style\b|<!--', re.IGNORECASE)
+MAILTO_BYTES_REGEX = re.compile(rb'<a\s[^>]*?href\s*=\s*["\']?\s*mailto:([^"\'\s>]+)', re.IGNORECASE)
+BASE64_BYTES_REGEX = re.compile(rb'=\s*["\']?\s*([A-Za-z0-9+/]{8,}={0,2})\s*["\'\s>]')  # 8: the encoding of a@b.cc
+ASSET_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'avif', 'ico', 'css', 'js'}  # e.g. logo@2x.png
+CHARSET_REGEX = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_REGEX = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
 BLOCKED_EMAIL_KEYWORDS = ['example', 'noreply']
 CONTACT = ['contact', 'kontakt', 'contat', 'kapcsolat', 'quem-somos', 'impressum']  # 'eπικοινωνια' 
+CONTACT_PATHS = list(CONTACT)  # Probed below the company's path even when no link mentions them (e.g. menus built by JS)
+PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS * CONTACT_PROBES, thread_name_prefix="probe")
+# Requests Chrome drops in light render mode: resources that never carry an email, and common trackers
+BLOCKED_RESOURCES = [
+    f"*.{ext}{query}"
+    for ext in ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "woff", "woff2", "ttf", "otf", "eot",
+                "mp4", "webm", "mp3", "ogg", "wav")
+    for query in ("", "?*")
+] + ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*", "*hotjar.com*"]
+# Resolves once the DOM is parsed and either an email is on the page or loading is complete
+# (false keeps WebDriverWait polling).
+EMAIL_READY_JS = """
+if (document.readyState === "loading" || !document.body) return false;
+if (document.readyState === "complete") return true;
+return document.querySelector('a[href^="mailto:" i]') !== null || /@|\(at\)|\[at\]|\{at\}/i.test(document.body.textContent);
+"""
+# Collects in the page what _scan_page collects from a tree, so the DOM never has to be shipped to Python
+RENDER_JS = """
+if (!document.body) return null;
+const skip = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+const page = {url: location.href, text: [], iframes: [], links: [], attributes: [], size: 0};
+const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+while (walker.nextNode()) {
+    const node = walker.currentNode;
+    if (!skip.has(node.parentNode.nodeName)) page.text.push(node.nodeValue);
+}
+for (const frame of document.querySelectorAll("iframe[src]")) page.iframes.push(frame.getAttribute("src"));
+for (const a of document.querySelectorAll("a[href]")) page.links.push([a.getAttribute("href"), a.textContent.trim()]);
+for (const element of document.body.querySelectorAll("*")) {
+    for (const attribute of element.attributes) {
+        const value = attribute.value.trim();
+        if (value.length >= 16 && /^[A-Za-z0-9+\/]+={0,2}$/.test(value)) page.attributes.push(value);
+    }
+}
+page.size = document.documentElement.outerHTML.length;
+return page;
+"""
 GENERIC_EMAIL_KEYWORDS = ['info', 'contact', 'office', 'hello', 'admin', 'mail']
 GATE_KEYWORDS = ["yes", "si", "ja", "oui", "sim", "accept", "agree", "continue", "older", "i am", "enter",
                  "english", "ok", "got it"]
 
-def fetch_html(url, timeout=TIMEOUT, retries=0):
-    """Fetches HTML content from a given URL and parses it."""
+def set_parser(parser):
+    """Switches the BeautifulSoup parser backend, e.g. to the faster "lxml" (check it with bench/parity.py first)."""
+    global PARSER
+    PARSER = parser
+
+def set_host_scheduler(scheduler):
+    """Routes every fetch_html request through a HostScheduler and sizes the connection pools to match."""
+    global SCHEDULER
+    SCHEDULER = scheduler
+    for prefix in ("http://", "https://"):
+        SESSION.mount(prefix, requests.adapters.HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=scheduler.max_concurrency))
+
+set_host_scheduler(SCHEDULER)
+
+def set_errors_file(filename):
+    """Makes add_company_to_csv log to another CSV (each process of a parallel run needs its own)."""
+    global ERRORS_FILE
+    ERRORS_FILE = filename
+
+def set_response_cache(cache):
+    """Puts a ResponseCache in front of every fetch_html request (None disables caching)."""
+    global RESPONSE_CACHE
+    RESPONSE_CACHE = cache
+
+def set_resolver(resolver):
+    """Makes fetch_html skip hosts the Resolver knows don't resolve (None disables the DNS cache)."""
+    global RESOLVER
+    RESOLVER = resolver
+
+def prefetch_hosts(urls):
+    """Starts resolving the hosts of the given URLs in the background, if a Resolver is set."""
+    if RESOLVER is not None:
+        RESOLVER.prefetch(url for url in urls if is_valid_url(url))
+
+def http_get(url, timeout=TIMEOUT):
+    """GETs a URL without following redirects, going through the response cache if one is set."""
+    kwargs = dict(timeout=timeout, stream=True, headers=HEADERS, allow_redirects=False)
+    if RESPONSE_CACHE is None:
+        return SESSION.get(url, **kwargs)
+    return RESPONSE_CACHE.get(SESSION, url, **kwargs)
+
+def parse_html(markup, parser=None):
+    """Parses HTML with the configured parser backend (PARSER)."""
+    return BeautifulSoup(markup, parser or PARSER)
+
+class Page:
+    """Fetched HTML page that is only parsed into a BeautifulSoup tree once the tree is needed.
+    
+    Attribute access is forwarded to the tree, so a Page can be used wherever a soup is expected, while
+    extract_email can first look for an email in the raw body and skip parsing altogether.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.body = response.content
+        self.truncated = getattr(response, "truncated", False)  # Only part of the body was read, see read_body
+        self._soup = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self.response.encoding = detect_encoding(self.response, self.body)
+            self._soup = parse_html(self.response.text)
+        return self._soup
+
+    def __getattr__(self, name):
+        if name.startswith("_"):  # Avoid recursing through self._soup before __init__ ran (e.g. copy, pickle)
+            raise AttributeError(name)
+        return getattr(self.soup, name)
+
+class RenderedPage:
+    """Page rendered by Chrome in light mode. Holds the scan RENDER_JS collected in the browser instead of a tree,
+    so extract_email and extract_email_from_contact_page use it like a parsed page."""
+
+    def __init__(self, page):
+        self.url = page["url"]
+        self.scan = {"text": page["text"], "iframes": page["iframes"], "anchor_emails": [], "encoded_emails": [], "links": []}
+        for href, text in page["links"]:
+            if href.lower().startswith('mailto:'):
+                self.scan["anchor_emails"].append(clean_email(href[7:]))
+            if re.search(EMAIL_REGEX, text):
+                self.scan["anchor_emails"].append(clean_email(normalize_text(text)))
+            self.scan["links"].append([href, text.lower()])
+        for value in page["attributes"]:
+            decoded = try_base64_decode(value)
+            if decoded:
+                self.scan["encoded_emails"].append(decoded)
+
+def detect_encoding(response, body):
+    """Takes the encoding from the Content-Type header or a <meta charset> tag, and only falls back to
+    analyzing the byte content (slow on large pages) when neither names a known encoding."""
+    declared = CHARSET_REGEX.search(response.headers.get("Content-Type", ""))
+    if not declared:
+        declared = META_CHARSET_REGEX.search(body[:4096])
+        declared = declared and declared.group(1).decode("ascii")
+    else:
+        declared = declared.group(1)
+    if declared:
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    return response.apparent_encoding  # Analyzes the actual byte content and guesses the most likely encoding
+
+def read_body(response, max_size=MAX_BODY_SIZE, email_url=None):
+    """Streams a response body, reading at most max_size bytes. With email_url, the download stops as soon
+    as the part read so far contains an email select_primary_email prefers for email_url over any other (a
+    generic address on its domain), so stopping can't change the pick. The body is stored on the response,
+    so response.content and response.text return the part that was read (response.truncated tells whether
+    that is the whole body)."""
+    chunks = []
+    size = 0
+    unscanned = b""  # Read but not searched yet: from the end of the last complete markup on
+    stopped = False
+    domain = email_url and extract_domain(email_url)
+    for chunk in response.iter_content(CHUNK_SIZE):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_size:
+            stopped = True
+            break
+        if domain:
+            unscanned += chunk
+            end = complete_markup_end(unscanned)
+            if any(is_preferred_email(email, domain) for email in visible_email_candidates(unscanned[:end])):
+                stopped = True
+                break
+            unscanned = unscanned[end:]
+
+    body = b"".join(chunks)[:max_size]
+    response._content = body
+    response._content_consumed = True
+    response.truncated = stopped
+    if stopped:
+        response.close()  # Drop the connection instead of downloading the rest
+    return body
+
+def fetch_html(url, timeout=TIMEOUT, retries=0, stop_on_email=False, redirects=0):
+    """Fetches HTML content from a given URL and parses it.
+    With stop_on_email the download stops once an email was read that extract_email would pick for the page (for
+    pages we only need an email from). After a redirect, stop_on_email is the URL of the page that was asked for."""
     soup = ""
     if not is_valid_url(url):
         return soup, "Invalid URL"
     try:
-        response = SESSION.get(url, timeout=timeout, stream=True, headers=HEADERS, allow_redirects=False)
-        response.encoding = response.apparent_encoding  # Analyzes the actual byte content and guesses the most likely encoding
-        status_code = response.status_code
+        # Fresh cache hits don't touch the host, so they don't need to wait for it
+        cached = RESPONSE_CACHE is not None and RESPONSE_CACHE.fresh(url)
+        if not cached and RESOLVER is not None and RESOLVER.is_dead(url):
+            return soup, "DNS"  # Known not to resolve, no need to open a socket
+        with nullcontext() if cached else SCHEDULER.slot(url):
+            response = http_get(url, timeout)
+            status_code = response.status_code
+            email_url = (url if stop_on_email is True else stop_on_email) or None
+            if not 300 <= status_code < 400:
+                add_bytes(len(read_body(response, email_url=email_url)))
+        if not cached:
+            SCHEDULER.report(url, status_code, response.headers.get("Retry-After"))
         
         if 300 <= status_code < 400:
-            redirect_url = response.headers.get("Location").replace("www.www.", "www.")
+            redirect_url = (response.headers.get("Location") or "").replace("www.www.", "www.")
             if redirect_url:
                 if not urlparse(redirect_url).scheme:  # If missing scheme, add from current URL
                     redirect_url = urljoin(url, redirect_url)
-            # if redirect_url != url:  # Avoid infinite loop on same URL
-                return fetch_html(redirect_url)
+                if redirects >= MAX_REDIRECTS:  # Also stops redirect loops
+                    return soup, "Too Many Redirects"
+                return fetch_html(redirect_url, stop_on_email=email_url or False, redirects=redirects + 1)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Throttled: retry once the host's backoff (Retry-After) has passed. A 503 without Retry-After is
+        # usually a broken site rather than throttling, so it isn't retried.
+        if status_code == 429 or (status_code == 503 and response.headers.get("Retry-After")):
+            if retries < RETRIES:
+                return fetch_html(url, timeout, retries + 1, stop_on_email, redirects)
+
+        soup = Page(response)
         error = status_code
 
     except requests.exceptions.ConnectionError as e:
         if "NameResolutionError" in str(e) or "getaddrinfo failed" in str(e):
             error = "DNS" # DNS Failure (Domain cannot be resolved) 
+            if RESOLVER is not None:
+                RESOLVER.resolve(url)  # Remember it for the rest of the run (and the next runs) if the name doesn't exist
         else:
             error = f"Connection Error" #: {e}"
 
     except requests.exceptions.Timeout:
         error = "Timeout"
         if retries < RETRIES:
-            return fetch_html(url, 2*timeout, retries + 1)  # Retry fetching HTML
+            return fetch_html(url, 2*timeout, retries + 1, stop_on_email, redirects)  # Retry fetching HTML
+
+    except HostUnavailable:
+        error = "Host Unavailable"  # Circuit open, or the host asked us to wait too long
 
     except requests.exceptions.RequestException as e:
         error = f"Request Exception: {e}"
 
     return soup, error
 
-def initialize_selenium_driver():
-    """Initializes a Selenium WebDriver with Chrome options."""
+def is_success(error):
+    """Whether fetch_html's error is a 2xx status, i.e. the page itself was fetched (not an error page)."""
+    return isinstance(error, int) and 200 <= error < 300
+
+def initialize_selenium_driver(light=LIGHT_RENDER):
+    """Initializes a Selenium WebDriver with Chrome options.
+    With light, pages count as loaded once their DOM is ready and images, fonts, media and trackers are blocked."""
+    from selenium import webdriver
+    from selenium.common.exceptions import SessionNotCreatedException
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
     options = Options()
     options.add_argument("--headless")  # Run in headless mode
     options.add_argument("--no-sandbox")  # Bypass OS security model
     options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
     options.add_argument('--disable-gpu') # Applicable to Windows OS only
     options.add_argument(f"user-agent={HEADERS['User-Agent']}")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    if light:
+        options.page_load_strategy = "eager"  # driver.get returns at DOMContentLoaded instead of the load event
+    try:
+        driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    except SessionNotCreatedException:  # The reused chromedriver doesn't match Chrome anymore (e.g. Chrome updated)
+        driver = webdriver.Chrome(service=Service(chromedriver_path(refresh=True)), options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    if light:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCES})
     return driver
 
-def fetch_html_selenium(driver, url=None, bypass_gate=False, timeout=TIMEOUT):
+def chromedriver_path(refresh=False):
+    """Returns the chromedriver binary to use: the CHROMEDRIVER environment variable, else the one an earlier
+    run installed. webdriver_manager (which looks the matching version up online) is only asked when there is
+    none yet, or with refresh."""
+    global CHROMEDRIVER
+    with DRIVER_PATH_LOCK:
+        if refresh:
+            CHROMEDRIVER = None
+        elif CHROMEDRIVER is None:
+            path = os.environ.get("CHROMEDRIVER")
+            if not path and os.path.exists(DRIVER_PATH_FILE):
+                with open(DRIVER_PATH_FILE, encoding="utf-8") as f:
+                    path = f.read().strip()
+            if path and os.access(path, os.X_OK):
+                CHROMEDRIVER = path
+
+        if CHROMEDRIVER is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+            CHROMEDRIVER = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(DRIVER_PATH_FILE) or ".", exist_ok=True)
+            with open(DRIVER_PATH_FILE, "w", encoding="utf-8") as f:
+                f.write(CHROMEDRIVER)
+        return CHROMEDRIVER
+
+def fetch_html_selenium(driver, url=None, bypass_gate=False, timeout=TIMEOUT, light=LIGHT_RENDER):
+    """Renders a page with Selenium (the page the driver shows when url is None).
+    With light, the page is extracted in the browser into a RenderedPage once an email shows up (or loading is
+    complete), instead of serializing and parsing the whole DOM."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
+        driver.pages_rendered = getattr(driver, "pages_rendered", 0) + 1  # DriverPool recycles drivers by pages
         if url:
             driver.get(url)
         if bypass_gate and driver:
             try_click_gate_buttons(driver)
 
+        if light:
+            try:  # A None result can't tell whether the page is ready, so it stops the wait too
+                WebDriverWait(driver, RENDER_WAIT, poll_frequency=0.2).until(
+                    lambda d: d.execute_script(EMAIL_READY_JS) is not False
+                )
+            except:
+                pass
+            page = driver.execute_script(RENDER_JS)
+            if page:
+                add_bytes(page["size"])
+                return RenderedPage(page), 200, driver
+
         # Wait for some visible content 
         try:
             WebDriverWait(driver, timeout).until(
@@ -97,7 +399,8 @@ def fetch_html_selenium(driver, url=None, bypass_gate=False, timeout=TIMEOUT):
             pass
 
         html = driver.page_source
-        return BeautifulSoup(html, "html.parser"), 200, driver
+        add_bytes(len(html))
+        return parse_html(html), 200, driver
     except Exception as e:
         return "", f"Selenium error: {e}", driver
 
@@ -106,6 +409,8 @@ def try_click_gate_buttons(driver):
     Try to bypass first-visit gates (age, language, cookies) by clicking
     links or buttons containing relevant keywords.
     """
+    from selenium.webdriver.common.by import By
+
     # Collect candidate elements
     candidates = driver.find_elements(By.TAG_NAME, "a") + driver.find_elements(By.TAG_NAME, "button")
     for el in candidates:
@@ -146,6 +451,7 @@ def is_valid_url(url: str) -> bool:
         domain = re.search(r"https?://([^/]+)", url).group(1)
     except AttributeError:
         return False  # couldn't parse domain
+    domain = re.sub(r":\d+$", "", domain)  # An explicit port is fine (e.g. local test servers)
     
     # Valid domain characters: letters, numbers, hyphens, dots
     if not re.match(r"^[a-zA-Z0-9.-]+$", domain):
@@ -179,43 +485,33 @@ def extract_email(soup, url):
     """Extracts unique emails from visible text and mailto links in parsed HTML."""
     if not soup:
         return None
+
+    if isinstance(soup, Page):  # Fast path: a single email in the raw body needs no parsing at all
+        email = find_email_in_bytes(soup.body)
+        if email:
+            return email
     
+    scan = scan_page(soup)
     emails = set()
     # --- 1. Visible text from all elements ---
-    text = normalize_text(soup.get_text(separator=' '))
+    text = normalize_text(" ".join(scan["text"]))
     if text:
         emails = set(clean_email(e) for e in re.findall(EMAIL_REGEX, text))
     
     # --- 2. Handle iframes recursively ---
     if not emails:
-        for iframe in soup.find_all("iframe"):
-            src = iframe.get("src")
-            if src:
-                iframe_url = urljoin(url, src)
-                iframe_soup, _ = fetch_html(iframe_url)
-                email = extract_email(iframe_soup, iframe_url)
-                if email:
-                    emails.update(email)
-
-    # --- 3. Scan anchor tags ---
-    for a in soup.find_all('a'):
-        href = a.get('href', '')
-        if isinstance(href, str) and href.lower().startswith('mailto:'):
-            emails.add(clean_email(href[7:]))  # Remove 'mailto:' prefix
-
-        # anchor visible text can contain (obfuscated) emails too
-        link_text = a.get_text(strip=True)
-        if re.search(EMAIL_REGEX, link_text):
-            emails.add(clean_email(normalize_text(link_text)))
-
-    # --- 4. Scan all attributes for base64 encoded or hidden emails ---
-    for tag in soup.find_all(True):
-        for attr_val in tag.attrs.values():
-            if isinstance(attr_val, str):
-                attr_val = attr_val.strip()
-                decoded = try_base64_decode(attr_val)
-                if decoded:
-                    emails.add(decoded)
+        for src in scan["iframes"]:
+            iframe_url = urljoin(url, src)
+            iframe_soup, _ = fetch_html(iframe_url, stop_on_email=True)
+            email = extract_email(iframe_soup, iframe_url)
+            if email:
+                emails.add(email)
+
+    # --- 3. Mailto links and (obfuscated) emails in anchor text ---
+    emails.update(scan["anchor_emails"])
+
+    # --- 4. Base64 encoded or hidden emails in attributes ---
+    emails.update(scan["encoded_emails"])
 
     emails = list(filter(is_valid_email, emails))
     if not emails:
@@ -223,6 +519,111 @@ def extract_email(soup, url):
     email = emails[0] if len(emails) == 1 else select_primary_email(emails, url)
     return email
 
+def find_email_in_bytes(body):
+    """Returns the email if the raw body contains exactly one valid candidate extract_email would see, None on a
+    miss or when there are several candidates (the full extraction then decides which one is the primary email)."""
+    candidates = set()
+    for email in visible_email_candidates(body or b""):
+        candidates.add(email)
+        if len(candidates) > 1:
+            return None
+    return candidates.pop() if candidates else None
+
+def visible_email_candidates(body):
+    """Yields the valid emails of a raw body that extract_email would see: in the text, in mailto links and in
+    base64 encoded attributes (not in scripts, styles, comments or other attributes)."""
+    body = HIDDEN_BYTES_REGEX.sub(b" ", body)
+    yield from email_candidates(TAG_BYTES_REGEX.sub(b" ", body))
+    for address in MAILTO_BYTES_REGEX.findall(body):
+        yield from email_candidates(address)
+    for value in BASE64_BYTES_REGEX.findall(body):
+        email = try_base64_decode(value.decode("ascii"))
+        if email and is_valid_email(email):
+            yield email
+
+def complete_markup_end(body):
+    """Returns where the part of a partly read body ends that visible_email_candidates can search without seeing
+    the rest: after its last complete tag, and before a script, style or comment that isn't closed yet. Text
+    (and an email in it) can't span a tag, so the rest can be searched on its own once more is read."""
+    end = 0
+    for hidden in HIDDEN_BYTES_REGEX.finditer(body):
+        end = hidden.end()
+    unclosed = HIDDEN_START_BYTES_REGEX.search(body, end)
+    if unclosed:
+        return unclosed.start()
+    return body.rfind(b">") + 1
+
+def email_candidates(body):
+    """Yields the valid emails found in a raw response body."""
+    for match in EMAIL_BYTES_REGEX.findall(body or b""):
+        email = clean_email(AT_BYTES_REGEX.sub(b"@", match).decode("ascii"))
+        tld = email.rsplit(".", 1)[-1].lower()
+        if tld.isalpha() and tld not in ASSET_EXTENSIONS and is_valid_email(email):
+            yield email
+
+def scan_page(soup):
+    """Collects everything the email and contact page extraction need in a single traversal of the tree:
+    visible text, iframe sources, emails in anchors and attributes, and the (href, text) of every link.
+
+    The scan is kept on the soup, so extract_email and extract_email_from_contact_page share it.
+    """
+    if isinstance(soup, RenderedPage):
+        return soup.scan
+    if isinstance(soup, Page):
+        soup = soup.soup
+    scan = soup.__dict__.get("_page_scan")  # Not getattr, bs4 turns unknown attributes into find() calls
+    if scan is None:
+        scan = soup.__dict__["_page_scan"] = _scan_page(soup)
+    return scan
+
+def _scan_page(soup):
+    scan = {"text": [], "iframes": [], "anchor_emails": [], "encoded_emails": [], "links": []}
+    open_anchors = []  # Stripped text parts of the anchors we're currently inside
+    stack = [soup]
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, tuple):  # Closing an anchor, its text is complete
+            _, a, link = node
+            link_text = "".join(open_anchors.pop())
+            href = a.get('href', '')
+            if isinstance(href, str) and href.lower().startswith('mailto:'):
+                scan["anchor_emails"].append(clean_email(href[7:]))  # Remove 'mailto:' prefix
+            if re.search(EMAIL_REGEX, link_text):  # anchor visible text can contain (obfuscated) emails too
+                scan["anchor_emails"].append(clean_email(normalize_text(link_text)))
+            if link is not None:
+                link[1] = link_text.lower()  # visible button text
+            continue
+
+        if isinstance(node, NavigableString):
+            if type(node) in TEXT_TYPES:
+                scan["text"].append(node)
+                stripped = node.strip()
+                if stripped:
+                    for parts in open_anchors:
+                        parts.append(stripped)
+            continue
+
+        if node is not soup:
+            for attr_val in node.attrs.values():
+                if isinstance(attr_val, str):
+                    decoded = try_base64_decode(attr_val.strip())
+                    if decoded:
+                        scan["encoded_emails"].append(decoded)
+
+        if node.name == "iframe" and node.get("src"):
+            scan["iframes"].append(node.get("src"))
+        elif node.name == "a":
+            link = None
+            if node.get("href") is not None:
+                link = [node["href"], ""]  # Added on the opening tag to keep document order
+                scan["links"].append(link)
+            open_anchors.append([])
+            stack.append(("end", node, link))
+
+        stack.extend(reversed(node.contents))
+    return scan
+
 def normalize_text(text: str) -> str:
     """Clean common email obfuscations in text."""
     if not text:
@@ -266,8 +667,7 @@ def select_primary_email(email_list, company_url):
 
     # From domain-matched, prefer generic names
     for email in domain_matched:
-        prefix = email.split('@')[0].lower()
-        if any(keyword in prefix for keyword in GENERIC_EMAIL_KEYWORDS):
+        if is_preferred_email(email, domain):
             return email
 
     # Fallback: first domain-matched email
@@ -277,43 +677,73 @@ def select_primary_email(email_list, company_url):
     # Else: pick first short-looking email
     return sorted(email_list, key=len)[0]
 
+def is_preferred_email(email, domain):
+    """Whether select_primary_email prefers an email over the others: a generic name (info@, contact@, ...) on
+    the company domain."""
+    prefix = email.split('@')[0].lower()
+    return domain in email and any(keyword in prefix for keyword in GENERIC_EMAIL_KEYWORDS)
+
 def extract_domain(url):
     """Extracts domain name from a URL like https://www.company.com -> company.com"""
     netloc = urlparse(url).netloc
     return netloc.replace("www.", "") if netloc else ""
 
+def normalize_url(url):
+    """Normalizes a URL so equivalent URLs compare equal (case of scheme/host, default ports,
+    fragments and query parameter order don't matter)."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, query, ""))
+
 def homepage_fallback(url):
     """Fallback function to get the homepage URL (assuming its the base URL)."""
     parsed = urlparse(url)
     return f"{parsed.scheme}://{parsed.netloc}/"
 
-def extract_email_from_contact_page(soup, base_url, driver=None):
-    """Extracts emails from the contact page."""
+def extract_email_from_contact_page(soup, base_url, driver=None, probes=CONTACT_PROBES):
+    """Extracts emails from the contact page.
+    Without a driver, the best probes candidates and the conventional contact paths are fetched concurrently,
+    see probe_contact_pages."""
     if not soup:
         return None, "No contact page found"
     
     if driver:
-        WebDriverWait(driver, TIMEOUT).until(EC.presence_of_all_elements_located((By.TAG_NAME, "a")))
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support import expected_conditions as EC
+        try:
+            WebDriverWait(driver, TIMEOUT).until(EC.presence_of_all_elements_located((By.TAG_NAME, "a")))
+        except TimeoutException:  # A page without links, not a broken driver
+            return None, "No contact page found"
 
-    links = soup.find_all("a", href=True)
     strong_candidates = []
     weak_candidates = []
 
-    for a in links:
-        text = a.get_text(strip=True).lower()  # visible button text
-        href = a['href'].lower()
-
+    for href, text in scan_page(soup)["links"]:
         if COOKIE in text:
             continue
 
         # Check contact keywords
-        href_match = any(keyword in href for keyword in CONTACT)
+        href_match = any(keyword in href.lower() for keyword in CONTACT)
         text_match = any(keyword in text for keyword in CONTACT)
 
         if href_match and text_match:
-            strong_candidates.append(a)
+            strong_candidates.append(href)
         elif href_match or text_match:
-            weak_candidates.append(a)
+            weak_candidates.append(href)
+
+    if not driver and probes > 1:
+        # Nav and footer often link the same page, so duplicates go before the best probes are taken
+        urls = unique_urls([contact_url(href, base_url) for href in strong_candidates + weak_candidates], base_url)[:probes]
+        email, error = probe_contact_pages(urls, base_url, conventional_contact_urls(base_url))
+        if not email and not (strong_candidates or weak_candidates):
+            error = "No contact page found"
+        return email, error
 
     # Prefer strong match
     candidates = strong_candidates if strong_candidates else weak_candidates
@@ -321,21 +751,88 @@ def extract_email_from_contact_page(soup, base_url, driver=None):
     if not candidates:
         return None, "No contact page found"
 
-    contact_url = candidates[0]['href']
-    if contact_url.startswith("/"):
-        contact_url = base_url.rstrip("/") + contact_url
-    elif not contact_url.startswith("http"):
-        contact_url = base_url.rstrip("/") + "/" + contact_url
-    
+    url = contact_url(candidates[0], base_url)
     if not driver:
-        contact_html, error = fetch_html(contact_url) 
+        contact_html, error = fetch_html(url, stop_on_email=True) 
         
     else: 
-        contact_html, error, _ = fetch_html_selenium(driver, contact_url, bypass_gate=False) 
-    return extract_email(contact_html, contact_url), error
+        contact_html, error, _ = fetch_html_selenium(driver, url, bypass_gate=False) 
+    return extract_email(contact_html, url), error
+
+def contact_url(href, base_url):
+    """Makes a contact link absolute."""
+    if href.startswith("/"):
+        return urljoin(base_url, href)  # Root-relative, also when base_url has a path
+    elif not href.startswith("http"):
+        return base_url.rstrip("/") + "/" + href
+    return href
+
+def conventional_contact_urls(base_url):
+    """Makes the conventional contact paths absolute below the company's own path, so a site hosted under a path
+    (https://user.wixsite.com/winery) is probed at .../winery/contact rather than at the platform's /contact."""
+    parsed = urlparse(base_url)
+    directory = parsed.path or "/"
+    if not directory.endswith("/"):
+        directory, _, last = directory.rpartition("/")
+        directory += "/" if "." in last else "/" + last + "/"  # /index.html -> /, /winery -> /winery/
+    base = urlunparse((parsed.scheme, parsed.netloc, directory, "", "", ""))
+    return [urljoin(base, path) for path in CONTACT_PATHS]
+
+def unique_urls(urls, base_url, exclude=()):
+    """Drops the URLs of the page at base_url, of the exclude URLs, and of a page listed before, keeping the order."""
+    seen = {normalize_url(url).rstrip("/") for url in [base_url, *exclude]}
+    unique = []
+    for url in urls:
+        key = normalize_url(url).rstrip("/")
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+def probe_contact_pages(urls, base_url, fallback_urls=()):
+    """Fetches the contact page candidates concurrently (best first) and returns (email, error) of the first one
+    an email is found on, cancelling the rest. An email found on one of the fallback_urls (guessed rather than
+    linked) only counts once no candidate has one. URLs of the same page and the page at base_url are fetched
+    once at most. Without an email, the error is the one of the best candidate."""
+    urls = unique_urls(urls, base_url)
+    unique = [(url, False) for url in urls] + [(url, True) for url in unique_urls(fallback_urls, base_url, urls)]
+    if not unique:
+        return None, "No contact page found"
+
+    found = threading.Event()
+    def probe(url, fallback):
+        if found.is_set():  # Queued behind the probe that found the email
+            return None, None
+        html, error = fetch_html(url, stop_on_email=True)
+        email = extract_email(html, url)
+        if email and not fallback:
+            found.set()
+        return email, error
+
+    # Each probe runs in a copy of this context, so its bytes count towards the company's contact stage
+    futures = {PROBE_EXECUTOR.submit(contextvars.copy_context().run, probe, url, fallback): fallback for url, fallback in unique}
+    candidates = sum(not fallback for fallback in futures.values())
+    fallback_result = None
+    try:
+        for future in as_completed(futures):
+            email, error = future.result()
+            if futures[future]:
+                fallback_result = fallback_result or (email and (email, error))
+            elif email:
+                return email, error
+            else:
+                candidates -= 1
+            if fallback_result and not candidates:
+                return fallback_result
+    finally:
+        for future in futures:
+            future.cancel()
+    return None, next(iter(futures)).result()[1]
 
 def save_to_csv(data, filename, headers=None):
     """Saves data to a CSV."""
+    import pandas as pd
+
     if headers is not None:
         df = pd.DataFrame(data, columns=headers)
     else:
@@ -343,44 +840,170 @@ def save_to_csv(data, filename, headers=None):
     df.drop_duplicates(inplace=True)
     df.to_csv(filename, index=False)
 
-def add_company_to_csv(url, error, csv_filename="output/errors.csv", headers=None):
-    """Adds a company's information to an existing CSV file.
+class CsvSink:
+    """Writes rows to a CSV file as they arrive, skipping duplicate rows (like save_to_csv's drop_duplicates)."""
+
+    def __init__(self, filename, headers):
+        self.file = open(filename, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+        self.seen = set()  # Hashes of the rows written so far, so the rows themselves needn't be kept
+
+    def write(self, row):
+        key = hash(tuple(row))
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParquetSink:
+    """Writes records to a directory of Parquet files as they arrive, one file per row_group_size records, skipping
+    duplicate records like CsvSink.
+
+    Every chunk is a complete file that appears atomically, so downstream jobs can read a crawl that is still
+    running (pandas.read_parquet(directory), pyarrow.dataset) and only miss the last, unfinished chunk.
+    """
+
+    def __init__(self, directory, columns, row_group_size=ROW_GROUP_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, "part-*.parquet")):  # Like CsvSink, a run replaces the output
+            os.remove(stale)
+        self.directory = directory
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.parts = 0
+        self.seen = set()
+
+    def write(self, record):
+        key = hash(tuple(record[column] for column in self.columns))
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.rows.append(record)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({column: pa.array([row[column] for row in self.rows], pa.string()) for column in self.columns})
+        path = os.path.join(self.directory, f"part-{self.parts:05d}.parquet")
+        temp = os.path.join(self.directory, f".part-{self.parts:05d}.parquet.tmp")  # Readers skip dot files
+        pq.write_table(table, temp)
+        os.replace(temp, path)
+        self.parts += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def export_csv(directory, links_csv, emails_csv):
+    """Derives the links and emails CSVs from the Parquet chunks a ParquetSink wrote (so far)."""
+    import pyarrow.parquet as pq
+
+    parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    with CsvSink(links_csv, headers=["url"]) as links, \
+         CsvSink(emails_csv, headers=["name", "country", "email"]) as emails:
+        for part in parts:
+            for record in pq.read_table(part).to_pylist():
+                links.write([record["link"]])
+                emails.write([record["name"], record["country"], record["email"]])
+
+class ErrorLog:
+    """Append-only error CSV. Rows are buffered and flushed in batches, and duplicate URLs are skipped
+    using an in-memory index of the URLs already logged. Safe to share between concurrent workers."""
+
+    def __init__(self, filename=ERRORS_FILE, headers=None, batch_size=ERROR_BATCH_SIZE):
+        self.headers = headers if headers is not None else ['error', 'url']
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.urls = set()
+
+        # Index the URLs of an existing log so they aren't logged twice across runs
+        file_exists = os.path.exists(filename) and os.path.getsize(filename) > 0
+        if file_exists:
+            with open(filename, newline="", encoding="utf-8") as f:
+                self.urls = {row.get("url") for row in csv.DictReader(f)}
+        else:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+        self.file = open(filename, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if not file_exists:
+            self.writer.writerow(self.headers)
+        atexit.register(self.close)  # Don't lose buffered rows when the run ends or crashes
+
+    def add(self, url, error):
+        with self.lock:
+            if url in self.urls:
+                return
+            self.urls.add(url)
+            self.buffer.append([error, url])
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer and not self.file.closed:
+            self.writer.writerows(self.buffer)
+            self.buffer.clear()
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self._flush()
+                self.file.close()
+
+ERROR_LOGS = {}  # One shared ErrorLog per CSV file
+ERROR_LOGS_LOCK = threading.Lock()
+
+def get_error_log(csv_filename=None, headers=None):
+    """Returns the shared ErrorLog for a CSV file (ERRORS_FILE by default), opening it on first use."""
+    csv_filename = csv_filename or ERRORS_FILE
+    with ERROR_LOGS_LOCK:
+        if csv_filename not in ERROR_LOGS:
+            ERROR_LOGS[csv_filename] = ErrorLog(csv_filename, headers)
+        return ERROR_LOGS[csv_filename]
+
+def close_error_log(csv_filename=None):
+    """Flushes and closes the shared ErrorLog of a CSV file (ERRORS_FILE by default), if it was opened."""
+    with ERROR_LOGS_LOCK:
+        log = ERROR_LOGS.pop(csv_filename or ERRORS_FILE, None)
+    if log:
+        log.close()
+
+def add_company_to_csv(url, error, csv_filename=None, headers=None):
+    """Logs a company's URL and the error that stopped its email from being found.
     
     Args:
-        company_name (str): Name of the company
-        country (str): Country where the company is located
-        link (str): Website URL of the company
-        csv_filename (str): Path to the CSV file
+        url (str): Website URL of the company
+        error (str | int): Error message or HTTP status code
+        csv_filename (str, optional): Path to the error CSV file. Defaults to ERRORS_FILE
         headers (list, optional): Column headers if creating a new file. 
-                                 Defaults to ['company_name', 'country', 'link']
+                                 Defaults to ['error', 'url']
     """
-    
-    # Default headers if not provided
-    if headers is None:
-        headers = ['error', 'url']
-
-    # Check if file exists
-    file_exists = os.path.exists(csv_filename)
-    
-    # Create new row data
-    new_row = [error, url]
-    
-    if file_exists:
-        # Read existing data
-        try:
-            df = pd.read_csv(csv_filename)
-            # Add new row
-            new_data = pd.DataFrame([new_row], columns=headers)
-            df = pd.concat([df, new_data], ignore_index=True)
-        except pd.errors.EmptyDataError:
-            # File exists but is empty
-            df = pd.DataFrame([new_row], columns=headers)
-    else:
-        # Create new DataFrame
-        df = pd.DataFrame([new_row], columns=headers)
-
-    # Remove duplicates based on company name and URL
-    df.drop_duplicates(subset=['url'], inplace=True)
-
-    # Save to CSV
-    df.to_csv(csv_filename, index=False)
+    get_error_log(csv_filename, headers).add(url, error)
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import namedtuple
+
+QUEUE_FILE = "output/queue.db"
+VISIBILITY_TIMEOUT = 600  # Seconds a job stays leased to a worker before another worker may take it over
+MAX_ATTEMPTS = 3  # Times a job is handed out before it is given up on
+
+Job = namedtuple("Job", ["id", "kind", "payload", "attempts"])
+# Moves the next queued job id to the leased set in one step, so a worker dying in between can't lose it
+LEASE_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if job_id then redis.call('ZADD', KEYS[2], ARGV[1], job_id) end
+return job_id
+"""
+
+class SqliteQueue:
+    """Work queue in a SQLite file, for workers on one machine (threads and processes).
+
+    Jobs are leased rather than removed when a worker takes them: one that isn't acknowledged within the
+    visibility timeout (its worker died or hangs) is handed out again, up to MAX_ATTEMPTS times. Jobs put with
+    a key are only queued once, which deduplicates companies listed on several pages. Results are kept in the
+    same file, so every worker adds to one aggregated output.
+
+    RedisQueue implements the same methods on a Redis-compatible server for workers on several machines.
+    """
+
+    def __init__(self, path=QUEUE_FILE, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, key TEXT UNIQUE, kind TEXT, payload TEXT,
+                state TEXT, attempts INTEGER, leased_until REAL, error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, leased_until);
+            CREATE TABLE IF NOT EXISTS results (
+                scope TEXT, key TEXT, record TEXT,
+                PRIMARY KEY (scope, key)
+            );
+        """)
+
+    def put(self, kind, payload, key=None):
+        """Queues a job. Returns False if a job with the same key was queued before."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, 'queued', 0, 0, NULL)",
+                (uuid.uuid4().hex, key, kind, json.dumps(payload)),
+            )
+        return cursor.rowcount == 1
+
+    def get(self):
+        """Leases the next job (queued, or leased by a worker that didn't finish it in time). None if there is none."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")  # Other processes can't lease the same job in between
+            try:
+                self.conn.execute(
+                    "UPDATE jobs SET state = 'dead', error = 'Visibility timeout' "
+                    "WHERE state = 'leased' AND leased_until < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                )
+                row = self.conn.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs "
+                    "WHERE state = 'queued' OR (state = 'leased' AND leased_until < ?) ORDER BY rowid LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE jobs SET state = 'leased', attempts = attempts + 1, leased_until = ? WHERE id = ?",
+                        (now + self.visibility_timeout, row[0]),
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        job_id, kind, payload, attempts = row
+        return Job(job_id, kind, json.loads(payload), attempts + 1)
+
+    def ack(self, job):
+        """Marks a leased job as done."""
+        with self.lock:
+            self.conn.execute("UPDATE jobs SET state = 'done', error = NULL WHERE id = ?", (job.id,))
+
+    def fail(self, job, error):
+        """Hands a job that failed out again, or gives up on it after max_attempts."""
+        state = "dead" if job.attempts >= self.max_attempts else "queued"
+        with self.lock:  # Unless its lease expired and another worker took it over meanwhile
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, error = ? WHERE id = ? AND state = 'leased' AND attempts = ?",
+                (state, str(error), job.id, job.attempts),
+            )
+
+    def pending(self, prefix=""):
+        """Number of jobs that are queued or being worked on (only those whose key starts with prefix, if given)."""
+        query = "SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'leased')"
+        with self.lock:
+            if not prefix:
+                return self.conn.execute(query).fetchone()[0]
+            return self.conn.execute(query + " AND substr(key, 1, ?) = ?", (len(prefix), prefix)).fetchone()[0]
+
+    def purge(self, prefix):
+        """Forgets the jobs whose key starts with prefix, whatever their state, so they can be queued again."""
+        with self.lock:
+            self.conn.execute("DELETE FROM jobs WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def clear_results(self, scope):
+        """Forgets the records of a crawl."""
+        with self.lock:
+            self.conn.execute("DELETE FROM results WHERE scope = ?", (scope,))
+
+    def counts(self):
+        """Number of jobs per state."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def add_result(self, scope, key, record):
+        """Adds a record to the aggregated output of a crawl. A record with the same key replaces the earlier one."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (scope, key, json.dumps(record)))
+
+    def results(self, scope):
+        """Returns the records of a crawl, in the order their keys sort."""
+        with self.lock:
+            rows = self.conn.execute("SELECT record FROM results WHERE scope = ? ORDER BY key", (scope,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RedisQueue:
+    """Work queue on a Redis-compatible server (Redis, Valkey, KeyDB, ...), for workers on several machines.
+
+    Same methods and semantics as SqliteQueue. Queued job ids are kept in a list, leased ones in a sorted set
+    scored by their deadline. client is a redis-py client (or anything with the same commands), e.g.
+    redis.Redis.from_url("redis://host:6379/0").
+    """
+
+    def __init__(self, client, prefix="scraper", visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+
+    def _key(self, name):
+        return f"{self.prefix}:{name}"
+
+    def put(self, kind, payload, key=None):
+        if key is not None and not self.client.sadd(self._key("keys"), key):
+            return False
+        job_id = uuid.uuid4().hex
+        job = {"kind": kind, "payload": payload, "attempts": 0, "key": key}
+        self.client.hset(self._key("jobs"), job_id, json.dumps(job))
+        self.client.lpush(self._key("queued"), job_id)
+        return True
+
+    def get(self):
+        self._requeue_expired()
+        deadline = time.time() + self.visibility_timeout
+        job_id = self.client.eval(LEASE_SCRIPT, 2, self._key("queued"), self._key("leased"), deadline)
+        if job_id is None:
+            return None
+        job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+        job = self.client.hget(self._key("jobs"), job_id)
+        if job is None:  # Finished by the worker whose lease had expired
+            self.client.zrem(self._key("leased"), job_id)
+            return self.get()
+        job = json.loads(job)
+        job["attempts"] += 1
+        self.client.hset(self._key("jobs"), job_id, json.dumps(job))
+        return Job(job_id, job["kind"], job["payload"], job["attempts"])
+
+    def _requeue_expired(self):
+        """Hands out the jobs of workers that didn't finish in time again. zrem decides which worker
+        requeues a job when several see it expire."""
+        for job_id in self.client.zrangebyscore(self._key("leased"), "-inf", time.time()):
+            if self.client.zrem(self._key("leased"), job_id):
+                job = self.client.hget(self._key("jobs"), job_id)
+                if job is None:
+                    continue
+                job = json.loads(job)
+                if job["attempts"] >= self.max_attempts:
+                    self._bury(job_id, job, "Visibility timeout")
+                else:
+                    self.client.lpush(self._key("queued"), job_id)
+
+    def ack(self, job):
+        self.client.zrem(self._key("leased"), job.id)
+        if self.client.hdel(self._key("jobs"), job.id):  # Not when another worker that took it over finished first
+            self.client.incr(self._key("done"))
+
+    def fail(self, job, error):
+        stored = self.client.hget(self._key("jobs"), job.id)
+        stored = stored and json.loads(stored)
+        if not stored or stored["attempts"] != job.attempts or not self.client.zrem(self._key("leased"), job.id):
+            return  # Its lease expired and another worker took it over
+        if job.attempts >= self.max_attempts:
+            self._bury(job.id, stored, error)
+        else:
+            self.client.lpush(self._key("queued"), job.id)
+
+    def _bury(self, job_id, job, error):
+        job["error"] = str(error)
+        self.client.hdel(self._key("jobs"), job_id)
+        self.client.hset(self._key("dead"), job_id, json.dumps(job))
+
+    def pending(self, prefix=""):
+        if not prefix:
+            return self.client.llen(self._key("queued")) + self.client.zcard(self._key("leased"))
+        return len(self._jobs("jobs", prefix))  # The jobs hash only holds queued and leased jobs
+
+    def _jobs(self, name, prefix):
+        """Ids of the jobs in the jobs or dead hash whose key starts with prefix."""
+        jobs = self.client.hgetall(self._key(name))
+        return [job_id for job_id, job in jobs.items() if (json.loads(job).get("key") or "").startswith(prefix)]
+
+    def purge(self, prefix):
+        for job_id in self._jobs("jobs", prefix):
+            self.client.hdel(self._key("jobs"), job_id)
+            self.client.lrem(self._key("queued"), 0, job_id)
+            self.client.zrem(self._key("leased"), job_id)
+        for job_id in self._jobs("dead", prefix):
+            self.client.hdel(self._key("dead"), job_id)
+        for key in self.client.smembers(self._key("keys")):  # Also the keys of done jobs
+            if (key.decode() if isinstance(key, bytes) else key).startswith(prefix):
+                self.client.srem(self._key("keys"), key)
+
+    def clear_results(self, scope):
+        self.client.delete(self._key(f"results:{scope}"))
+
+    def counts(self):
+        return {
+            "queued": self.client.llen(self._key("queued")),
+            "leased": self.client.zcard(self._key("leased")),
+            "done": int(self.client.get(self._key("done")) or 0),
+            "dead": self.client.hlen(self._key("dead")),
+        }
+
+    def add_result(self, scope, key, record):
+        self.client.hset(self._key(f"results:{scope}"), key, json.dumps(record))
+
+    def results(self, scope):
+        results = self.client.hgetall(self._key(f"results:{scope}"))
+        return [json.loads(results[key]) for key in sorted(results)]
+
+    def close(self):
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_queue(path=QUEUE_FILE, redis_url=None):
+    """Opens the work queue: on the Redis-compatible server at redis_url if one is given, else in a SQLite file."""
+    if redis_url:
+        import redis  # Only needed for crawls spread over several machines
+        return RedisQueue(redis.Redis.from_url(redis_url))
+    return SqliteQueue(path)